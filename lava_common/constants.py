@@ -39,6 +39,12 @@ HTTP_DOWNLOAD_CHUNK_SIZE = 32768
 # Size of the chunks when downloading over scp
 SCP_DOWNLOAD_CHUNK_SIZE = 32768
 
+# Size of the buffer used by tarfile when copying members
+TARFILE_COPY_BUFSIZE = 2 * 1024 * 1024
+
+# gzip compression level of the lava overlay tarball
+OVERLAY_COMPRESSLEVEL = 1
+
 # dispatcher temporary directory
 # This is distinct from the TFTP daemon directory
 # Files here are for download using the Apache /tmp alias.
@@ -63,6 +63,7 @@ class Pipeline:
 
     def __init__(self, parent=None, job=None, parameters=None):
         self.actions = []
+        self._by_name = {}
         self.parent = None
         self.parameters = {} if parameters is None else parameters
         self.job = job
@@ -87,6 +88,7 @@ class Pipeline:
     def add_action(self, action, parameters=None):
         self._check_action(action)
         self.actions.append(action)
+        self._by_name.setdefault(action.name, []).append(action)
         # FIXME: if this is only happening in unit test, this has to be fixed later on
         # should only be None inside the unit tests
         action.job = self.job
@@ -144,6 +146,24 @@ class Pipeline:
 
         action.parameters = parameters
 
+    def first(self, name):
+        """
+        Return the first action of this pipeline with the given name.
+        Raises KeyError if there is no such action.
+        """
+        return self._by_name[name][0]
+
+    def walk(self, depth=0):
+        """
+        Iterate over all the actions of the pipeline, recursing through
+        any internal pipelines, depth first.
+        :return: a generator of (action, depth) tuples
+        """
+        for action in self.actions:
+            yield (action, depth)
+            if action.internal_pipeline is not None:
+                yield from action.internal_pipeline.walk(depth + 1)
+
     def describe(self, verbose=True):
         """
         Describe the current pipeline, recursing through any
@@ -249,8 +269,8 @@ class Pipeline:
                 if action.timeout.can_skip(action.parameters):
                     if self.parent is None:
                         action.logger.warning(
-                            "skip_timeout is set for %s - continuing to next action block."
-                            % (action.name)
+                            "skip_timeout is set for %s - continuing to next action block.",
+                            action.name,
                         )
                     else:
                         raise
@@ -560,8 +580,8 @@ class Action:
                 self.results = {"returncode": "0"}
                 self.results = {"output_len": len(log)}
                 self.logger.info(
-                    "Parsed command exited zero with allow_fail set, returning %s bytes."
-                    % len(log)
+                    "Parsed command exited zero with allow_fail set, returning %s bytes.",
+                    len(log),
                 )
         except subprocess.CalledProcessError as exc:
             # the errors property doesn't support removing errors
@@ -573,7 +593,7 @@ class Action:
                 output = str(exc)
             errors.append(output)
             self.results = {"returncode": "%s" % exc.returncode}
-            self.logger.info("Parsed command exited %s." % retcode)
+            self.logger.info("Parsed command exited %s.", retcode)
             base = (
                 "action: {0}\ncommand: {1}\nmessage: {2}\noutput: {3}\nreturn code: {4}"
             )
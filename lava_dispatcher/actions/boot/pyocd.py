@@ -18,6 +18,8 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
+from itertools import chain
+
 from lava_common.utils import binary_version
 from lava_dispatcher.action import Pipeline, Action, JobError
 from lava_dispatcher.logical import Boot, RetryAction
@@ -98,44 +100,49 @@ class FlashPyOCDAction(Action):
 
     def validate(self):
         super().validate()
-        boot = self.job.device["actions"]["boot"]["methods"]["pyocd"]
-        pyocd_binary = boot["parameters"]["command"]
+        device = self.job.device
+        boot_params = device["actions"]["boot"]["methods"]["pyocd"]["parameters"]
+        board_id = device["board_id"]
+        pyocd_binary = boot_params["command"]
         binary = which(pyocd_binary)
         self.logger.info(binary_version(binary, "--version"))
-        self.base_command = [pyocd_binary]
-        self.base_command.extend(boot["parameters"].get("options", []))
-        if self.job.device["board_id"] == "0000000000":
+        if board_id == "0000000000":
             self.errors = "[PYOCD] board_id unset"
+        # Each option from the device dictionary can hold several arguments
+        self.base_command = list(
+            chain(
+                [pyocd_binary],
+                chain.from_iterable(
+                    option.split(" ") for option in boot_params.get("options", [])
+                ),
+                ["--board", board_id],
+            )
+        )
         substitutions = {}
-        self.base_command.extend(["--board", self.job.device["board_id"]])
         for action in self.get_namespace_keys("download-action"):
-            pyocd_full_command = []
+            # Only strings are read here, no need to copy them
             image_arg = self.get_namespace_data(
-                action="download-action", label=action, key="image_arg"
+                action="download-action", label=action, key="image_arg", deepcopy=False
             )
             action_arg = self.get_namespace_data(
-                action="download-action", label=action, key="file"
+                action="download-action", label=action, key="file", deepcopy=False
             )
             if image_arg:
                 if not isinstance(image_arg, str):
                     self.errors = "image_arg is not a string (try quoting it)"
                     continue
                 substitutions["{%s}" % action] = action_arg
-                pyocd_full_command.extend(self.base_command)
-                pyocd_full_command.extend(substitute([image_arg], substitutions))
-                self.exec_list.append(pyocd_full_command)
+                image_args = substitute([image_arg], substitutions)[0].split(" ")
+                self.exec_list.append(self.base_command + image_args)
             else:
-                pyocd_full_command.extend(self.base_command)
-                pyocd_full_command.extend([action_arg])
-                self.exec_list.append(pyocd_full_command)
+                self.exec_list.append(self.base_command + [action_arg])
         if not self.exec_list:
             self.errors = "No PyOCD command to execute"
 
     def run(self, connection, max_end_time):
         connection = super().run(connection, max_end_time)
         for pyocd_command in self.exec_list:
-            pyocd = " ".join(pyocd_command)
-            self.logger.info("PyOCD command: %s", pyocd)
-            if not self.run_command(pyocd.split(" ")):
-                raise JobError("%s command failed" % (pyocd.split(" ")))
+            self.logger.info("PyOCD command: %s", " ".join(pyocd_command))
+            if not self.run_command(pyocd_command):
+                raise JobError("%s command failed" % pyocd_command)
         return connection
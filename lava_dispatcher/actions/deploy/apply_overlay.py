@@ -20,13 +20,14 @@
 
 import os
 import shutil
+import signal
 import subprocess  # nosec - internal use.
+import tempfile
 from lava_dispatcher.action import Action, Pipeline
 from lava_common.exceptions import InfrastructureError, JobError, LAVABug
 from lava_common.constants import RAMDISK_FNAME, UBOOT_DEFAULT_HEADER_LENGTH
 from lava_common.utils import debian_filename_version
 from lava_dispatcher.actions.deploy.overlay import OverlayAction
-from lava_dispatcher.utils.contextmanager import chdir
 from lava_dispatcher.utils.installers import add_late_command, add_to_kickstart
 from lava_dispatcher.utils.filesystem import (
     lxc_path,
@@ -37,7 +38,11 @@ from lava_dispatcher.utils.filesystem import (
     copy_overlay_to_sparse_fs,
 )
 from lava_dispatcher.utils.shell import which
-from lava_dispatcher.utils.compression import compress_file, decompress_file, untar_file
+from lava_dispatcher.utils.compression import (
+    compress_pipe_command_map,
+    decompress_stream,
+    untar_file,
+)
 from lava_dispatcher.utils.strings import substitute
 from lava_dispatcher.utils.network import dispatcher_ip
 from lava_dispatcher.actions.deploy.prepare import PrepareKernelAction
@@ -574,26 +579,51 @@ class ExtractRamdisk(Action):
             suffix = ".%s" % compression
         ramdisk_compressed_data = os.path.join(ramdisk_dir, RAMDISK_FNAME + suffix)
         if self.parameters["ramdisk"].get("header") == "u-boot":
-            cmd = (
-                "dd if=%s of=%s ibs=%s skip=1"
-                % (ramdisk, ramdisk_compressed_data, UBOOT_DEFAULT_HEADER_LENGTH)
-            ).split(" ")
+            self.logger.debug("Removing u-boot header from %s", ramdisk)
             try:
-                self.run_command(cmd)
-            except Exception:
+                with open(ramdisk, "rb") as fin:
+                    with open(ramdisk_compressed_data, "wb") as fout:
+                        # copy the data after the header inside the kernel
+                        offset = UBOOT_DEFAULT_HEADER_LENGTH
+                        size = os.fstat(fin.fileno()).st_size
+                        while offset < size:
+                            sent = os.sendfile(
+                                fout.fileno(), fin.fileno(), offset, size - offset
+                            )
+                            if not sent:
+                                break
+                            offset += sent
+            except OSError:
                 raise LAVABug("Unable to remove uboot header: %s" % ramdisk)
         else:
             # give the file a predictable name
             shutil.move(ramdisk, ramdisk_compressed_data)
-        ramdisk_data = decompress_file(ramdisk_compressed_data, compression)
+        # CompressRamdisk recreates the cpio archive under this name
+        ramdisk_data = os.path.join(ramdisk_dir, RAMDISK_FNAME)
 
-        with chdir(extracted_ramdisk):
-            cmd = ("cpio -iud -F %s" % ramdisk_data).split(" ")
-            if not self.run_command(cmd):
-                raise JobError(
-                    "Unable to extract cpio archive: %s - missing header definition (i.e. u-boot)?"
-                    % ramdisk_data
+        # stream the decompressed data straight into cpio
+        cmd = ["cpio", "-iud"]
+        self.logger.debug("%s < %s", " ".join(cmd), ramdisk_compressed_data)
+        with decompress_stream(ramdisk_compressed_data, compression) as data:
+            try:
+                cpio = subprocess.run(  # nosec - internal use.
+                    cmd,
+                    stdin=data,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    cwd=extracted_ramdisk,
                 )
+            except OSError as exc:
+                raise InfrastructureError("Unable to run cpio: %s" % exc)
+        for line in cpio.stdout.decode("utf-8", errors="replace").strip().split("\n"):
+            self.logger.debug("output: %s", line)
+        if cpio.returncode:
+            raise JobError(
+                "Unable to extract cpio archive: %s - missing header definition (i.e. u-boot)?"
+                % ramdisk_compressed_data
+            )
+        # CompressRamdisk builds a new archive from the unpacked files
+        os.unlink(ramdisk_compressed_data)
 
         # tell other actions where the unpacked ramdisk can be found
         self.set_namespace_data(
@@ -686,24 +716,55 @@ class CompressRamdisk(Action):
                     action=self.name, label="file", key="preseed_local", value=filename
                 )
 
-        with chdir(ramdisk_dir):
-            self.logger.info(
-                "Building ramdisk %s containing %s", ramdisk_data, ramdisk_dir
-            )
-            cmd = "find . | cpio --create --format='newc' > %s" % ramdisk_data
-            try:
-                log = subprocess.check_output(  # nosec - safe to use shell=True here, no external arguments
-                    cmd, shell=True, stderr=subprocess.STDOUT
+        # we need to compress the ramdisk with the same method is was submitted with
+        compression = self.parameters["ramdisk"].get("compression")
+        final_file = ramdisk_data
+        commands = [["find", "."], ["cpio", "--create", "--format=newc"]]
+        if compression:
+            if compression not in compress_pipe_command_map:
+                raise JobError(
+                    "Cannot find shell command to compress: %s" % compression
                 )
-                log = log.decode("utf-8", errors="replace")
+            which(compress_pipe_command_map[compression][0])
+            commands.append(compress_pipe_command_map[compression])
+            final_file = "%s.%s" % (ramdisk_data, compression)
+
+        self.logger.info("Building ramdisk %s containing %s", final_file, ramdisk_dir)
+        self.logger.debug(" | ".join(" ".join(cmd) for cmd in commands))
+        # run find | cpio | compressor as a single pipeline, so that the
+        # uncompressed archive is never written to disk
+        with open(final_file, "wb") as output, tempfile.TemporaryFile() as log:
+            procs = []
+            try:
+                for cmd in commands:
+                    procs.append(
+                        subprocess.Popen(  # nosec - internal use.
+                            cmd,
+                            stdin=procs[-1].stdout if procs else subprocess.DEVNULL,
+                            stdout=output if cmd is commands[-1] else subprocess.PIPE,
+                            stderr=log,
+                            cwd=ramdisk_dir,
+                        )
+                    )
+                    # only the next command in the pipeline reads this output
+                    if len(procs) > 1:
+                        procs[-2].stdout.close()
             except OSError as exc:
+                for proc in procs:
+                    proc.kill()
                 raise InfrastructureError("Unable to create cpio filesystem: %s" % exc)
-            # lazy-logging would mean that the quoting of cmd causes invalid YAML
-            self.logger.debug("%s\n%s" % (cmd, log))
-
-            # we need to compress the ramdisk with the same method is was submitted with
-            compression = self.parameters["ramdisk"].get("compression")
-            final_file = compress_file(ramdisk_data, compression)
+            finally:
+                for proc in procs:
+                    proc.wait()
+            log.seek(0)
+            for line in log.read().decode("utf-8", errors="replace").splitlines():
+                self.logger.debug("output: %s", line)
+        # a command killed by SIGPIPE is only a symptom of the next one failing
+        for cmd, proc in zip(commands, procs):
+            if proc.returncode and proc.returncode != -signal.SIGPIPE:
+                raise InfrastructureError(
+                    "Unable to create ramdisk %s: '%s' failed" % (final_file, cmd[0])
+                )
 
         tftp_dir = os.path.dirname(
             self.get_namespace_data(
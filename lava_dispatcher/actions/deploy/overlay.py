@@ -18,17 +18,19 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
+import functools
 import os
 import stat
 import glob
 import shutil
+import subprocess  # nosec - internal use.
 import tarfile
 from lava_dispatcher.actions.deploy import DeployAction
 from lava_dispatcher.action import Action, Pipeline
+from lava_common.constants import OVERLAY_COMPRESSLEVEL, TARFILE_COPY_BUFSIZE
 from lava_common.exceptions import InfrastructureError, LAVABug
 from lava_dispatcher.actions.deploy.testdef import TestDefinitionAction
 from lava_dispatcher.logical import Deployment
-from lava_dispatcher.utils.contextmanager import chdir
 from lava_dispatcher.utils.filesystem import check_ssh_identity_file
 from lava_dispatcher.utils.shell import which
 from lava_dispatcher.utils.network import rpcinfo_nfs
@@ -36,6 +38,15 @@ from lava_dispatcher.protocols.multinode import MultinodeProtocol
 from lava_dispatcher.protocols.vland import VlandProtocol
 
 
+@functools.lru_cache(maxsize=None)
+def _lava_scripts(directory):
+    """
+    The lava-* helper scripts shipped with the dispatcher do not change
+    while it is running: only scan each directory once.
+    """
+    return tuple(sorted(glob.glob(os.path.join(directory, "lava-*"))))
+
+
 class Overlay(Deployment):
     compatibility = 4
     name = "overlay"
@@ -98,9 +109,7 @@ class OverlayAction(DeployAction):
 
     def validate(self):
         super().validate()
-        self.scripts_to_copy = sorted(
-            glob.glob(os.path.join(self.lava_test_dir, "lava-*"))
-        )
+        self.scripts_to_copy = list(_lava_scripts(self.lava_test_dir))
         # Distro-specific scripts override the generic ones
         if not self.test_needs_overlay(self.parameters):
             return
@@ -124,9 +133,7 @@ class OverlayAction(DeployAction):
         distro = self.parameters["deployment_data"].get("distro")
         if distro:
             distro_support_dir = "%s/distro/%s" % (self.lava_test_dir, distro)
-            self.scripts_to_copy += sorted(
-                glob.glob(os.path.join(distro_support_dir, "lava-*"))
-            )
+            self.scripts_to_copy += _lava_scripts(distro_support_dir)
 
         if not self.scripts_to_copy:
             self.logger.debug("Skipping lava_test_shell support scripts.")
@@ -162,6 +169,21 @@ class OverlayAction(DeployAction):
             self.internal_pipeline.add_action(CompressOverlay())
             self.internal_pipeline.add_action(PersistentNFSOverlay())  # idempotent
 
+    @staticmethod
+    def _copy_script(fin, fout):
+        """
+        Append the content of the script to the header already written to
+        fout, letting the kernel copy the data.
+        """
+        fout.flush()
+        size = os.fstat(fin.fileno()).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(fout.fileno(), fin.fileno(), offset, size - offset)
+            if not sent:
+                break
+            offset += sent
+
     def _export_data(self, fout, data, prefix):
         if isinstance(data, dict):
             if prefix:
@@ -211,13 +233,13 @@ class OverlayAction(DeployAction):
         for runner_dir in ["bin", "tests", "results"]:
             # avoid os.path.join as lava_test_results_dir startswith / so location is *dropped* by join.
             path = os.path.abspath("%s/%s" % (lava_path, runner_dir))
-            if not os.path.exists(path):
-                os.makedirs(path, 0o755)
-                self.logger.debug("makedir: %s", path)
+            os.makedirs(path, 0o755, exist_ok=True)
+            self.logger.debug("makedir: %s", path)
+        bin_dir = "%s/bin/" % lava_path
         for fname in self.scripts_to_copy:
-            with open(fname, "r") as fin:
+            with open(fname, "rb") as fin:
                 foutname = os.path.basename(fname)
-                output_file = "%s/bin/%s" % (lava_path, foutname)
+                output_file = bin_dir + foutname
                 if "distro" in fname:
                     distribution = os.path.basename(os.path.dirname(fname))
                     self.logger.debug("Updating %s (%s)", output_file, distribution)
@@ -242,7 +264,7 @@ class OverlayAction(DeployAction):
                                 )
                                 fout.write(r"\t%s\t%s\n" % (key, value))
                         fout.write('"\n')
-                    fout.write(fin.read())
+                    self._copy_script(fin, fout)
                     os.fchmod(fout.fileno(), self.xmod)
 
         # Generate environment file
@@ -348,17 +370,16 @@ class MultinodeOverlayAction(OverlayAction):
 
         # Generic scripts
         lava_path = os.path.abspath("%s/%s" % (location, lava_test_results_dir))
-        scripts_to_copy = glob.glob(
-            os.path.join(self.lava_multi_node_test_dir, "lava-*")
-        )
+        scripts_to_copy = _lava_scripts(self.lava_multi_node_test_dir)
         self.logger.debug(self.lava_multi_node_test_dir)
         self.logger.debug("lava_path: %s", lava_path)
         self.logger.debug("scripts to copy %s", scripts_to_copy)
 
+        bin_dir = "%s/bin/" % lava_path
         for fname in scripts_to_copy:
-            with open(fname, "r") as fin:
+            with open(fname, "rb") as fin:
                 foutname = os.path.basename(fname)
-                output_file = "%s/bin/%s" % (lava_path, foutname)
+                output_file = bin_dir + foutname
                 self.logger.debug("Creating %s", output_file)
                 with open(output_file, "w") as fout:
                     fout.write("#!%s\n\n" % shell)
@@ -391,7 +412,7 @@ class MultinodeOverlayAction(OverlayAction):
                         )
                         # always write out full debug logs
                         fout.write("LAVA_MULTI_NODE_DEBUG='yes'\n")
-                    fout.write(fin.read())
+                    self._copy_script(fin, fout)
                     os.fchmod(fout.fileno(), self.xmod)
         self.call_protocols()
         return connection
@@ -498,14 +519,15 @@ class VlandOverlayAction(OverlayAction):
             raise LAVABug("Unable to find overlay location")
 
         lava_path = os.path.abspath("%s/%s" % (location, lava_test_results_dir))
-        scripts_to_copy = glob.glob(os.path.join(self.lava_vland_test_dir, "lava-*"))
+        scripts_to_copy = _lava_scripts(self.lava_vland_test_dir)
         self.logger.debug(self.lava_vland_test_dir)
         self.logger.debug({"lava_path": lava_path, "scripts": scripts_to_copy})
 
+        bin_dir = "%s/bin/" % lava_path
         for fname in scripts_to_copy:
-            with open(fname, "r") as fin:
+            with open(fname, "rb") as fin:
                 foutname = os.path.basename(fname)
-                output_file = "%s/bin/%s" % (lava_path, foutname)
+                output_file = bin_dir + foutname
                 self.logger.debug("Creating %s", output_file)
                 with open(output_file, "w") as fout:
                     fout.write("#!%s\n\n" % shell)
@@ -526,7 +548,7 @@ class VlandOverlayAction(OverlayAction):
                             for line in self.tags:
                                 fout.write(r"%s\n" % line)
                     fout.write('"\n\n')
-                    fout.write(fin.read())
+                    self._copy_script(fin, fout)
                     os.fchmod(fout.fileno(), self.xmod)
         self.call_protocols()
         return connection
@@ -541,6 +563,36 @@ class CompressOverlay(Action):
     description = "Create a lava overlay tarball and store alongside the job"
     summary = "Compress the lava overlay files"
 
+    def _add_overlay(self, tar, location, lava_test_results_dir):
+        tar.copybufsize = TARFILE_COPY_BUFSIZE
+        tar.add(
+            "%s%s" % (location, lava_test_results_dir),
+            arcname=".%s" % lava_test_results_dir,
+        )
+        # ssh authorization support
+        if os.path.exists(os.path.join(location, "root")):
+            tar.add(os.path.join(location, "root"), arcname=".%s" % "/root/")
+
+    def _compress_pigz(self, pigz, output, location, lava_test_results_dir):
+        self.logger.debug("Compressing the overlay with %s", pigz)
+        with open(output, "wb") as fout:
+            proc = subprocess.Popen(  # nosec - internal use.
+                [pigz, "-%d" % OVERLAY_COMPRESSLEVEL, "-c"],
+                stdin=subprocess.PIPE,
+                stdout=fout,
+            )
+            try:
+                with tarfile.open(fileobj=proc.stdin, mode="w|") as tar:
+                    self._add_overlay(tar, location, lava_test_results_dir)
+            finally:
+                proc.stdin.close()
+                proc.wait()
+        if proc.returncode:
+            raise InfrastructureError(
+                "Unable to compress lava overlay tarball: %s returned %d"
+                % (pigz, proc.returncode)
+            )
+
     def run(self, connection, max_end_time):
         output = os.path.join(self.mkdtemp(), "overlay-%s.tar.gz" % self.level)
         location = self.get_namespace_data(
@@ -560,17 +612,21 @@ class CompressOverlay(Action):
             self.logger.error(self.errors)
             return connection
         connection = super().run(connection, max_end_time)
-        with chdir(location):
-            try:
-                with tarfile.open(output, "w:gz") as tar:
-                    tar.add(".%s" % lava_test_results_dir)
-                    # ssh authorization support
-                    if os.path.exists("./root/"):
-                        tar.add(".%s" % "/root/")
-            except tarfile.TarError as exc:
-                raise InfrastructureError(
-                    "Unable to create lava overlay tarball: %s" % exc
-                )
+        # pigz spreads the compression over all the cores
+        try:
+            pigz = which("pigz")
+        except InfrastructureError:
+            pigz = None
+        try:
+            if pigz:
+                self._compress_pigz(pigz, output, location, lava_test_results_dir)
+            else:
+                with tarfile.open(
+                    output, "w:gz", compresslevel=OVERLAY_COMPRESSLEVEL
+                ) as tar:
+                    self._add_overlay(tar, location, lava_test_results_dir)
+        except (OSError, tarfile.TarError) as exc:
+            raise InfrastructureError("Unable to create lava overlay tarball: %s" % exc)
 
         self.set_namespace_data(
             action=self.name, label="output", key="file", value=output
@@ -121,7 +121,7 @@ class MultinodeTestAction(TestShellAction):
         ret = super().check_patterns(event, test_connection, check_char)
         if event == "multinode":
             name, params = test_connection.match.groups()
-            self.logger.debug("Received Multi_Node API <LAVA_%s>" % name)
+            self.logger.debug("Received Multi_Node API <LAVA_%s>", name)
             params = params.split()
             test_case_name = "%s-%s" % (name, params[0])  # use the messageID
             self.logger.debug("messageID: %s", test_case_name)
@@ -130,9 +130,7 @@ class MultinodeTestAction(TestShellAction):
             try:
                 ret = self.signal_director.signal(name, params)
             except MultinodeProtocolTimeoutError as exc:
-                self.logger.warning(
-                    "Sync error in %s signal: %s %s" % (event, exc, name)
-                )
+                self.logger.warning("Sync error in %s signal: %s %s", event, exc, name)
 
                 self.signal_test_case(
                     test_case_params.format(test_case_name.lower(), "fail").split()
@@ -168,14 +166,14 @@ class MultinodeTestAction(TestShellAction):
             self.character_delay = character_delay
 
         def _on_send(self, *args):
-            self.logger.debug("%s lava-send" % MultinodeProtocol.name)
+            self.logger.debug("%s lava-send", MultinodeProtocol.name)
             arg_length = len(args)
             if arg_length == 1:
                 msg = {"request": "lava_send", "messageID": args[0], "message": {}}
             else:
                 message_id = args[0]
                 remainder = args[1:arg_length]
-                self.logger.debug("%d key value pair(s) to be sent." % len(remainder))
+                self.logger.debug("%d key value pair(s) to be sent.", len(remainder))
                 data = {}
                 for message in remainder:
                     detail = str.split(message, "=")
@@ -184,14 +182,14 @@ class MultinodeTestAction(TestShellAction):
                 msg = {"request": "lava_send", "messageID": message_id, "message": data}
 
             msg.update(self.base_message)
-            self.logger.debug(str("Handling signal <LAVA_SEND %s>" % json.dumps(msg)))
+            self.logger.debug("Handling signal <LAVA_SEND %s>", json.dumps(msg))
             reply = self.protocol(msg)
             if reply == "nack":
                 # FIXME: does this deserve an automatic retry? Does it actually happen?
                 raise TestError("Coordinator was unable to accept LAVA_SEND")
 
         def _on_sync(self, message_id):
-            self.logger.debug("Handling signal <LAVA_SYNC %s>" % message_id)
+            self.logger.debug("Handling signal <LAVA_SYNC %s>", message_id)
             msg = {"request": "lava_sync", "messageID": message_id, "message": None}
             msg.update(self.base_message)
             reply = self.protocol(msg)
@@ -205,11 +203,11 @@ class MultinodeTestAction(TestShellAction):
             self.connection.sendline("\n")
 
         def _on_wait(self, message_id):
-            self.logger.debug("Handling signal <LAVA_WAIT %s>" % message_id)
+            self.logger.debug("Handling signal <LAVA_WAIT %s>", message_id)
             msg = {"request": "lava_wait", "messageID": message_id, "message": None}
             msg.update(self.base_message)
             reply = self.protocol(msg)
-            self.logger.debug("reply=%s" % reply)
+            self.logger.debug("reply=%s", reply)
             message_str = ""
             if reply == "nack":
                 message_str = " nack"
@@ -223,7 +221,7 @@ class MultinodeTestAction(TestShellAction):
             self.connection.sendline("\n")
 
         def _on_wait_all(self, message_id, role=None):
-            self.logger.debug("Handling signal <LAVA_WAIT_ALL %s>" % message_id)
+            self.logger.debug("Handling signal <LAVA_WAIT_ALL %s>", message_id)
             msg = {"request": "lava_wait_all", "messageID": message_id, "role": role}
             msg.update(self.base_message)
             reply = self.protocol(msg)
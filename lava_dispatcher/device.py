@@ -63,6 +63,10 @@ class PipelineDevice(dict):
     def power_command(self):
         return self.get("commands", {}).get("power_on", "")
 
+    @property
+    def boot_methods(self):
+        return self.get("actions", {}).get("boot", {}).get("methods", {})
+
     @property
     def connect_command(self):
         if "connect" in self["commands"]:
@@ -243,7 +243,7 @@ class ShellSession(Connection):
         # connection_prompt_limit
         partial_timeout = remaining / 2.0
         logger.debug(
-            "Waiting using forced prompt support. %ss timeout" % partial_timeout
+            "Waiting using forced prompt support. %ss timeout", partial_timeout
         )
         while True:
             try:
@@ -18,6 +18,8 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
+import copy
+import functools
 import os
 import sys
 import time
@@ -42,6 +44,23 @@ from lava_dispatcher.actions.deploy.image import DeployImages
 from lava_dispatcher.tests.utils import DummyLogger
 
 
+@functools.lru_cache(maxsize=None)
+def _read_file(path):
+    with open(path) as f_in:
+        return f_in.read()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_sample_job(path):
+    return yaml_safe_load(_read_file(path))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_reference(path):
+    with open(path) as f_ref:
+        return yaml_safe_load(f_ref)
+
+
 class StdoutTestCase(unittest.TestCase):
     # set to True to update pipeline_references automatically.
     update_ref = False
@@ -55,8 +74,9 @@ class StdoutTestCase(unittest.TestCase):
                 yaml_safe_dump(
                     job.pipeline.describe(False), describe, default_flow_style=None
                 )
-        with open(y_file, "r") as f_ref:
-            return yaml_safe_load(f_ref)
+            _load_reference.cache_clear()
+        # the callers are free to modify the reference
+        return copy.deepcopy(_load_reference(y_file))
 
 
 class TestAction(StdoutTestCase):
@@ -190,26 +210,31 @@ class Factory:
             raise exc
         return ret
 
+    # rendered device dictionaries, by template and job context
+    _devices = {}
+
     def create_device(self, template, job_ctx=None):
         """
         Create a device configuration on-the-fly from in-tree
         device-type Jinja2 template.
         """
-        with open(
-            os.path.join(
-                os.path.dirname(__file__),
-                "..",
-                "..",
-                "lava_scheduler_app",
-                "tests",
-                "devices",
-                template,
+        key = (template, yaml_safe_dump(job_ctx) if job_ctx else "")
+        if key not in self._devices:
+            data = _read_file(
+                os.path.join(
+                    os.path.dirname(__file__),
+                    "..",
+                    "..",
+                    "lava_scheduler_app",
+                    "tests",
+                    "devices",
+                    template,
+                )
             )
-        ) as hikey:
-            data = hikey.read()
-        hostname = template.replace(".jinja2", "")
-        rendered = self.render_device_dictionary(hostname, data, job_ctx)
-        return (rendered, data)
+            hostname = template.replace(".jinja2", "")
+            rendered = self.render_device_dictionary(hostname, data, job_ctx)
+            self._devices[key] = (rendered, data)
+        return self._devices[key]
 
     def create_custom_job(self, template, job_data, job_ctx=None, validate=True):
         if validate:
@@ -236,8 +261,8 @@ class Factory:
 
     def create_job(self, template, filename, job_ctx=None, validate=True):
         y_file = os.path.join(os.path.dirname(__file__), filename)
-        with open(y_file) as sample_job_data:
-            job_data = yaml_safe_load(sample_job_data.read())
+        # create_custom_job() modifies the job definition
+        job_data = copy.deepcopy(_load_sample_job(y_file))
         return self.create_custom_job(template, job_data, job_ctx, validate)
 
     def create_kvm_job(self, filename, validate=False):
@@ -451,6 +476,33 @@ class TestPipeline(StdoutTestCase):
             [action.section for action in job.pipeline.actions],
         )
 
+    def test_first_action(self):
+        pipe = Pipeline()
+        actions = []
+        for name in ["first", "second", "first"]:
+            action = Action()
+            action.name = name
+            pipe.add_action(action)
+            actions.append(action)
+        self.assertIs(pipe.first("first"), actions[0])
+        self.assertIs(pipe.first("second"), actions[1])
+        with self.assertRaises(KeyError):
+            pipe.first("third")
+
+    def test_walk(self):
+        factory = Factory()
+        job = factory.create_kvm_job("sample_jobs/kvm.yaml")
+        walked = list(job.pipeline.walk())
+        self.assertEqual(
+            [action for action, depth in walked if depth == 0], job.pipeline.actions
+        )
+        deploy = job.pipeline.actions[0]
+        self.assertIn((deploy.internal_pipeline.actions[0], 1), walked)
+        self.assertEqual(
+            walked.index((deploy.internal_pipeline.actions[0], 1)),
+            walked.index((deploy, 0)) + 1,
+        )
+
     def test_namespace_data(self):
         factory = Factory()
         job = factory.create_kvm_job("sample_jobs/kvm.yaml")
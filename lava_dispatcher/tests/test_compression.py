@@ -19,11 +19,15 @@
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
 import copy
+import io
 import os
 import hashlib
+import tarfile
+import pytest
 from lava_common.exceptions import InfrastructureError
 from lava_dispatcher.tests.test_basic import Factory, StdoutTestCase
-from lava_dispatcher.utils.compression import decompress_file
+from lava_dispatcher.utils import compression
+from lava_dispatcher.utils.compression import decompress_file, untar_file
 from lava_dispatcher.utils.compression import decompress_command_map
 
 
@@ -109,3 +113,35 @@ class TestDecompression(StdoutTestCase):
         with self.assertRaises(InfrastructureError):
             decompress_file("/tmp/test.xz", "zip")  # nosec - unit test only.
         self.assertEqual(copy_of_command_map, decompress_command_map)
+
+
+@pytest.mark.parametrize("native", [True, False])
+def test_untar_file(monkeypatch, tmpdir, native):
+    if not native:
+
+        def which(path):
+            raise InfrastructureError("Cannot find command '%s' in $PATH" % path)
+
+        monkeypatch.setattr(compression, "which", which)
+
+    archive = str(tmpdir.join("archive.tar.gz"))
+    with tarfile.open(archive, "w:gz") as tar:
+        info = tarfile.TarInfo("./lava/bin/lava-test-runner")
+        info.size = 5
+        tar.addfile(info, io.BytesIO(b"hello"))
+    outdir = tmpdir.mkdir("out")
+    untar_file(archive, str(outdir))
+    assert outdir.join("lava", "bin", "lava-test-runner").read() == "hello"
+
+
+def test_untar_file_member(tmpdir):
+    archive = str(tmpdir.join("archive.tar.gz"))
+    with tarfile.open(archive, "w:gz") as tar:
+        for name, data in [("./Image", b"kernel"), ("./dtb", b"device tree")]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    outfile = str(tmpdir.join("dtb"))
+    untar_file(archive, None, member="./dtb", outfile=outfile)
+    with open(outfile, "rb") as target:
+        assert target.read() == b"device tree"
@@ -24,6 +24,7 @@ import glob
 import stat
 import shutil
 import pexpect
+import tarfile
 import tempfile
 import unittest
 import subprocess  # nosec - unit test support.
@@ -269,6 +270,83 @@ class TestDefinitionHandlers(StdoutTestCase):
         )
 
 
+class TestCompressOverlay(StdoutTestCase):
+    def setUp(self):
+        super().setUp()
+        factory = Factory()
+        self.job = factory.create_job("qemu01.jinja2", "sample_jobs/kvm.yaml")
+        self.job.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.job.tmp_dir)
+        deploy = self.job.pipeline.first("deployimages")
+        overlay = deploy.internal_pipeline.first("lava-overlay")
+        self.action = overlay.internal_pipeline.first("compress-overlay")
+        # a minimal overlay, with the ssh authorization files
+        self.location = os.path.join(self.job.tmp_dir, "overlay")
+        for path in ["lava-4212/bin/lava-test-runner", "root/.ssh/authorized_keys"]:
+            os.makedirs(os.path.dirname(os.path.join(self.location, path)))
+            with open(os.path.join(self.location, path), "w") as fout:
+                fout.write("content of %s\n" % path)
+        self.action.set_namespace_data(
+            action="test", label="shared", key="location", value=self.location
+        )
+        self.action.set_namespace_data(
+            action="test",
+            label="results",
+            key="lava_test_results_dir",
+            value="/lava-4212",
+        )
+
+    def check_tarball(self):
+        output = self.action.get_namespace_data(
+            action="compress-overlay", label="output", key="file"
+        )
+        self.assertTrue(output.endswith(".tar.gz"))
+        with tarfile.open(output) as tar:
+            self.assertEqual(
+                sorted(tar.getnames()),
+                [
+                    "./lava-4212",
+                    "./lava-4212/bin",
+                    "./lava-4212/bin/lava-test-runner",
+                    "./root",
+                    "./root/.ssh",
+                    "./root/.ssh/authorized_keys",
+                ],
+            )
+            runner = tar.extractfile("./lava-4212/bin/lava-test-runner")
+            self.assertEqual(
+                runner.read(), b"content of lava-4212/bin/lava-test-runner\n"
+            )
+
+    @patch(
+        "lava_dispatcher.actions.deploy.overlay.which",
+        side_effect=InfrastructureError("Cannot find command 'pigz' in $PATH"),
+    )
+    def test_tarfile(self, which_mock):
+        self.action.run(None, None)
+        self.check_tarball()
+
+    # gzip takes the same arguments as pigz
+    @unittest.skipIf(infrastructure_error("gzip"), "gzip not installed")
+    def test_pigz(self):
+        with patch(
+            "lava_dispatcher.actions.deploy.overlay.which",
+            return_value=shutil.which("gzip"),
+        ):
+            self.action.run(None, None)
+        self.check_tarball()
+
+    def test_pigz_failure(self):
+        # read the whole tarball, then fail
+        pigz = os.path.join(self.job.tmp_dir, "pigz")
+        with open(pigz, "w") as fout:
+            fout.write("#!/bin/sh\ncat > /dev/null\nexit 3\n")
+        os.chmod(pigz, stat.S_IRWXU)
+        with patch("lava_dispatcher.actions.deploy.overlay.which", return_value=pigz):
+            with self.assertRaisesRegex(InfrastructureError, "returned 3"):
+                self.action.run(None, None)
+
+
 class TestDefinitionSimple(StdoutTestCase):
     def setUp(self):
         super().setUp()
@@ -151,6 +151,14 @@ class TestJobDeviceParameters(StdoutTestCase):
             ConfigurationError, device.get_constant, ("non-existing-const")
         )
 
+    def test_device_boot_methods(self):
+        factory = Factory()
+        (rendered, _) = factory.create_device("bbb-01.jinja2")
+        device = NewDevice(yaml_safe_load(rendered))
+        self.assertIs(device.boot_methods, device["actions"]["boot"]["methods"])
+        self.assertIn("u-boot", device.boot_methods)
+        self.assertEqual(NewDevice({}).boot_methods, {})
+
 
 class TestDeviceEnvironment(StdoutTestCase):
     """
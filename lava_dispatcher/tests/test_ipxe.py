@@ -23,7 +23,7 @@ import os
 import unittest
 from unittest.mock import patch
 
-from lava_common.compat import yaml_safe_dump, yaml_safe_load
+from lava_common.compat import yaml_safe_load
 from lava_dispatcher.device import NewDevice
 from lava_dispatcher.parser import JobParser
 from lava_dispatcher.actions.boot.ipxe import BootloaderAction
@@ -61,9 +61,7 @@ class TestBootloaderAction(StdoutTestCase):
             [action.name for action in job.pipeline.actions],
             ["tftp-deploy", "bootloader-action", "lava-test-retry", "finalize"],
         )
-        tftp = [
-            action for action in job.pipeline.actions if action.name == "tftp-deploy"
-        ][0]
+        tftp = job.pipeline.first("tftp-deploy")
         self.assertTrue(
             tftp.get_namespace_data(action=tftp.name, label="tftp", key="ramdisk")
         )
@@ -79,22 +77,12 @@ class TestBootloaderAction(StdoutTestCase):
                 "deploy-device-env",
             ],
         )
-        self.assertIn(
-            "ramdisk",
-            [
-                action.key
-                for action in tftp.internal_pipeline.actions
-                if hasattr(action, "key")
-            ],
-        )
-        self.assertIn(
-            "kernel",
-            [
-                action.key
-                for action in tftp.internal_pipeline.actions
-                if hasattr(action, "key")
-            ],
-        )
+        keys = {
+            action.key
+            for action in tftp.internal_pipeline.actions
+            if hasattr(action, "key")
+        }
+        self.assertLessEqual({"ramdisk", "kernel"}, keys)
 
     def test_device_x86(self):
         job = self.factory.create_job("x86-02.jinja2", "sample_jobs/ipxe-ramdisk.yaml")
@@ -103,7 +91,7 @@ class TestBootloaderAction(StdoutTestCase):
             "telnet bumblebee 8003",
         )
         self.assertEqual(job.device["commands"].get("interrupt", " "), " ")
-        methods = job.device["actions"]["boot"]["methods"]
+        methods = job.device.boot_methods
         self.assertIn("ipxe", methods)
         self.assertEqual(
             methods["ipxe"]["parameters"].get("bootloader_prompt"), "iPXE>"
@@ -116,28 +104,17 @@ class TestBootloaderAction(StdoutTestCase):
         job = self.factory.create_job("x86-01.jinja2", "sample_jobs/ipxe-ramdisk.yaml")
         job.validate()
         self.assertEqual(job.pipeline.errors, [])
-        self.assertIn("ipxe", job.device["actions"]["boot"]["methods"])
-        params = job.device["actions"]["boot"]["methods"]["ipxe"]["parameters"]
+        self.assertIn("ipxe", job.device.boot_methods)
+        params = job.device.boot_methods["ipxe"]["parameters"]
         boot_message = params.get(
             "boot_message", job.device.get_constant("kernel-start-message")
         )
         self.assertIsNotNone(boot_message)
-        bootloader_action = [
-            action
-            for action in job.pipeline.actions
-            if action.name == "bootloader-action"
-        ][0]
-        bootloader_retry = [
-            action
-            for action in bootloader_action.internal_pipeline.actions
-            if action.name == "bootloader-retry"
-        ][0]
-        commands = [
-            action
-            for action in bootloader_retry.internal_pipeline.actions
-            if action.name == "bootloader-commands"
-        ][0]
-        self.assertEqual(commands.character_delay, 500)
+        by_name = {}
+        for action, _ in job.pipeline.walk():
+            by_name.setdefault(action.name, action)
+        self.assertIn("bootloader-retry", by_name)
+        self.assertEqual(by_name["bootloader-commands"].character_delay, 500)
         for action in job.pipeline.actions:
             action.validate()
             if isinstance(action, BootloaderAction):
@@ -218,8 +195,8 @@ class TestBootloaderAction(StdoutTestCase):
         description_ref = self.pipeline_reference("up2-initrd-nbd.yaml", job=job)
         self.assertEqual(description_ref, job.pipeline.describe(False))
         # Fixme: more asserts
-        self.assertIn("ipxe", job.device["actions"]["boot"]["methods"])
-        params = job.device["actions"]["boot"]["methods"]["ipxe"]["parameters"]
+        self.assertIn("ipxe", job.device.boot_methods)
+        params = job.device.boot_methods["ipxe"]["parameters"]
         for action in job.pipeline.actions:
             action.validate()
             if isinstance(action, BootloaderAction):
@@ -243,20 +220,11 @@ class TestBootloaderAction(StdoutTestCase):
             self.assertTrue(action.valid)
         job.validate()
         self.assertEqual(job.pipeline.errors, [])
-        deploy = None
-        overlay = None
-        extract = None
-        for action in job.pipeline.actions:
-            if action.name == "tftp-deploy":
-                deploy = action
-        if deploy:
-            for action in deploy.internal_pipeline.actions:
-                if action.name == "prepare-tftp-overlay":
-                    overlay = action
-        if overlay:
-            for action in overlay.internal_pipeline.actions:
-                if action.name == "extract-nfsrootfs":
-                    extract = action
+        by_name = {}
+        for action, _ in job.pipeline.walk():
+            by_name.setdefault(action.name, action)
+        overlay = by_name["prepare-tftp-overlay"]
+        extract = by_name.get("extract-nfsrootfs")
         test_dir = overlay.get_namespace_data(
             action="test", label="results", key="lava_test_results_dir"
         )
@@ -270,33 +238,29 @@ class TestBootloaderAction(StdoutTestCase):
     )
     def test_reset_actions(self, which_mock):
         job = self.factory.create_job("x86-01.jinja2", "sample_jobs/ipxe.yaml")
-        bootloader_action = None
-        bootloader_retry = None
-        reset_action = None
         for action in job.pipeline.actions:
             action.validate()
             self.assertTrue(action.valid)
-            if action.name == "bootloader-action":
-                bootloader_action = action
-        names = [
+        bootloader_action = job.pipeline.first("bootloader-action")
+        names = {
             r_action.name for r_action in bootloader_action.internal_pipeline.actions
-        ]
-        self.assertIn("connect-device", names)
-        self.assertIn("bootloader-retry", names)
-        for action in bootloader_action.internal_pipeline.actions:
-            if action.name == "bootloader-retry":
-                bootloader_retry = action
-        names = [
+        }
+        self.assertLessEqual({"connect-device", "bootloader-retry"}, names)
+        bootloader_retry = bootloader_action.internal_pipeline.first("bootloader-retry")
+        names = {
             r_action.name for r_action in bootloader_retry.internal_pipeline.actions
-        ]
-        self.assertIn("reset-device", names)
-        self.assertIn("bootloader-interrupt", names)
-        self.assertIn("expect-shell-connection", names)
-        self.assertIn("bootloader-commands", names)
-        for action in bootloader_retry.internal_pipeline.actions:
-            if action.name == "reset-device":
-                reset_action = action
-        names = [r_action.name for r_action in reset_action.internal_pipeline.actions]
+        }
+        self.assertLessEqual(
+            {
+                "reset-device",
+                "bootloader-interrupt",
+                "expect-shell-connection",
+                "bootloader-commands",
+            },
+            names,
+        )
+        reset_action = bootloader_retry.internal_pipeline.first("reset-device")
+        names = {r_action.name for r_action in reset_action.internal_pipeline.actions}
         self.assertIn("pdu-reboot", names)
 
     @unittest.skipIf(infrastructure_error("telnet"), "telnet not installed")
@@ -312,21 +276,9 @@ class TestBootloaderAction(StdoutTestCase):
         """
         job = self.factory.create_job("x86-01.jinja2", "sample_jobs/ipxe-ramdisk.yaml")
         job.validate()
-        bootloader = [
-            action
-            for action in job.pipeline.actions
-            if action.name == "bootloader-action"
-        ][0]
-        retry = [
-            action
-            for action in bootloader.internal_pipeline.actions
-            if action.name == "bootloader-retry"
-        ][0]
-        expect = [
-            action
-            for action in retry.internal_pipeline.actions
-            if action.name == "expect-shell-connection"
-        ][0]
+        bootloader = job.pipeline.first("bootloader-action")
+        retry = bootloader.internal_pipeline.first("bootloader-retry")
+        expect = retry.internal_pipeline.first("expect-shell-connection")
         check = expect.parameters
         (rendered, _) = self.factory.create_device("x86-01.jinja2")
         device = NewDevice(yaml_safe_load(rendered))
@@ -339,43 +291,20 @@ class TestBootloaderAction(StdoutTestCase):
             0
         ]
         self.assertIsNotNone(boot)
-        sample_job_string = yaml_safe_dump(sample_job_data)
         job = parser.parse(sample_job_string, device, 4212, None, "")
         job.logger = DummyLogger()
         job.validate()
-        bootloader = [
-            action
-            for action in job.pipeline.actions
-            if action.name == "bootloader-action"
-        ][0]
-        retry = [
-            action
-            for action in bootloader.internal_pipeline.actions
-            if action.name == "bootloader-retry"
-        ][0]
-        expect = [
-            action
-            for action in retry.internal_pipeline.actions
-            if action.name == "expect-shell-connection"
-        ][0]
+        bootloader = job.pipeline.first("bootloader-action")
+        retry = bootloader.internal_pipeline.first("bootloader-retry")
+        expect = retry.internal_pipeline.first("expect-shell-connection")
 
     def test_xz_nfs(self):
         job = self.factory.create_job("x86-01.jinja2", "sample_jobs/ipxe-nfs.yaml")
         # this job won't validate as the .xz nfsrootfs URL is a fiction
         self.assertRaises(JobError, job.validate)
-        tftp_deploy = [
-            action for action in job.pipeline.actions if action.name == "tftp-deploy"
-        ][0]
-        prepare = [
-            action
-            for action in tftp_deploy.internal_pipeline.actions
-            if action.name == "prepare-tftp-overlay"
-        ][0]
-        nfs = [
-            action
-            for action in prepare.internal_pipeline.actions
-            if action.name == "extract-nfsrootfs"
-        ][0]
+        tftp_deploy = job.pipeline.first("tftp-deploy")
+        prepare = tftp_deploy.internal_pipeline.first("prepare-tftp-overlay")
+        nfs = prepare.internal_pipeline.first("extract-nfsrootfs")
         self.assertIn("compression", nfs.parameters["nfsrootfs"])
         self.assertEqual(nfs.parameters["nfsrootfs"]["compression"], "xz")
 
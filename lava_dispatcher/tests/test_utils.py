@@ -34,6 +34,7 @@ from lava_dispatcher.action import Action
 from lava_dispatcher.utils import vcs, installers
 from lava_dispatcher.utils.decorator import replace_exception
 from lava_dispatcher.utils.shell import which
+from lava_dispatcher.utils.strings import substitute
 
 
 class TestGit(StdoutTestCase):
@@ -364,6 +365,41 @@ class TestInstallers(StdoutTestCase):
             )
 
 
+class TestSubstitute(StdoutTestCase):
+    def test_prefix_key(self):
+        commands = ["setenv root {ROOT}", "setenv part {ROOT}_PART"]
+        self.assertEqual(
+            substitute(commands, {"{ROOT}_PART": "2", "{ROOT}": "/dev/sda"}),
+            ["setenv root /dev/sda", "setenv part 2"],
+        )
+        self.assertEqual(
+            substitute(
+                ["{KERNEL} {KERNEL_ADDR}"],
+                {"{KERNEL}": "zImage", "{KERNEL_ADDR}": "0x80000000"},
+            ),
+            ["zImage 0x80000000"],
+        )
+
+    def test_value_with_key(self):
+        # the keys are replaced in turn: later keys are expanded in earlier values
+        self.assertEqual(substitute(["a {A}"], {"{A}": "{B}", "{B}": "z"}), ["a z"])
+        self.assertEqual(substitute(["a {B}"], {"{B}": "{A}", "{A}": "z"}), ["a z"])
+
+    def test_drop(self):
+        commands = ["kernel {KERNEL}", "dtb {DTB}", "initrd {RAMDISK}"]
+        dictionary = {"{KERNEL}": "zImage", "{DTB}": None, "{RAMDISK}": ""}
+        self.assertEqual(substitute(commands, dictionary, drop=True), ["kernel zImage"])
+        # without drop, empty values leave the markup unchanged
+        self.assertEqual(
+            substitute(commands, dictionary),
+            ["kernel zImage", "dtb {DTB}", "initrd {RAMDISK}"],
+        )
+        # the check applies to the line after the earlier replacements
+        self.assertEqual(
+            substitute(["a {A}"], {"{A}": "{B}", "{B}": None}, drop=True), []
+        )
+
+
 class TestVersions(StdoutTestCase):
     @unittest.skipIf(infrastructure_error("dpkg-query"), "dpkg-query not installed")
     def test_dpkg(self):
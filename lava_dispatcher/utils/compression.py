@@ -24,10 +24,15 @@
 # android images: tar + xz,bz2,gz, or just gz,xz,bzip2
 # vexpress recovery images: any compression though usually zip
 
+import contextlib
 import os
+import shutil
+import signal
 import subprocess  # nosec - internal use.
 import tarfile
+import tempfile
 
+from lava_common.constants import TARFILE_COPY_BUFSIZE
 from lava_common.exceptions import InfrastructureError, JobError
 
 from lava_dispatcher.utils.contextmanager import chdir
@@ -36,12 +41,24 @@ from lava_dispatcher.utils.shell import which
 
 # https://www.kernel.org/doc/Documentation/xz.txt
 compress_command_map = {"xz": ["xz", "--check=crc32"], "gz": ["gzip"], "bz2": ["bzip2"]}
+compress_pipe_command_map = {
+    "xz": ["xz", "--check=crc32", "-c"],
+    "gz": ["gzip", "-c"],
+    "bz2": ["bzip2", "-c"],
+}
 decompress_command_map = {
     "xz": ["unxz"],
     "gz": ["gunzip"],
     "bz2": ["bunzip2"],
     "zip": ["unzip"],
 }
+# decompress to stdout, to feed another command
+decompress_pipe_command_map = {
+    "xz": ["unxz", "-c"],
+    "gz": ["gunzip", "-c"],
+    "bz2": ["bunzip2", "-c"],
+    "zip": ["unzip", "-p"],
+}
 
 
 def compress_file(infile, compression):
@@ -89,18 +106,79 @@ def decompress_file(infile, compression):
             )
 
 
+@contextlib.contextmanager
+def decompress_stream(infile, compression):
+    """
+    Yield a binary file object reading the decompressed content of infile.
+    The data is decompressed on the fly by a child process so that it can
+    be fed to another command without writing it to disk first.
+    """
+    if not compression:
+        with open(infile, "rb") as fin:
+            yield fin
+        return
+    if compression not in decompress_pipe_command_map.keys():
+        raise JobError("Cannot find shell command to decompress: %s" % compression)
+
+    # Check that the command does exists
+    which(decompress_pipe_command_map[compression][0])
+
+    cmd = decompress_pipe_command_map[compression] + [infile]
+    # stderr goes to a file: a full stderr pipe would block the child while
+    # the reader is still waiting for stdout
+    with tempfile.TemporaryFile() as log:
+        try:
+            proc = subprocess.Popen(  # nosec - internal use.
+                cmd, stdout=subprocess.PIPE, stderr=log
+            )
+        except OSError as exc:
+            raise InfrastructureError(
+                "unable to decompress file %s: %s" % (infile, exc)
+            )
+        try:
+            yield proc.stdout
+        finally:
+            proc.stdout.close()
+            proc.wait()
+        log.seek(0)
+        error = log.read().decode("utf-8", errors="replace").strip()
+    # SIGPIPE only means that the reader did not need the remaining data
+    if proc.returncode and proc.returncode != -signal.SIGPIPE:
+        raise InfrastructureError("unable to decompress file %s: %s" % (infile, error))
+
+
 def untar_file(infile, outdir, member=None, outfile=None):
+    if member is None:
+        try:
+            which("tar")
+        except InfrastructureError:
+            pass
+        else:
+            # Let the native tar handle whole archives: it is much faster
+            # than tarfile on large rootfs and detects the compression itself.
+            cmd = ["tar", "--numeric-owner", "-C", outdir, "-xf", infile]
+            try:
+                subprocess.check_output(  # nosec - internal use.
+                    cmd, stderr=subprocess.STDOUT
+                )
+            except subprocess.CalledProcessError as exc:
+                raise JobError(
+                    "Unable to unpack %s: %s"
+                    % (infile, exc.output.decode("utf-8", errors="replace").strip())
+                )
+            return
+
     try:
-        tar = tarfile.open(infile)
         if member:
-            file_obj = tar.extractfile(member)
-            target = open(outfile, "wb")
-            target.write(file_obj.read())
-            target.close()
-            file_obj.close()
-            tar.close()
+            with tarfile.open(infile) as tar:
+                tar.copybufsize = TARFILE_COPY_BUFSIZE
+                with tar.extractfile(member) as file_obj:
+                    with open(outfile, "wb") as target:
+                        shutil.copyfileobj(file_obj, target, TARFILE_COPY_BUFSIZE)
         else:
-            tar.extractall(outdir)
-            tar.close()
+            # read the whole archive sequentially, in large blocks
+            with tarfile.open(infile, "r|*", bufsize=TARFILE_COPY_BUFSIZE) as tar:
+                tar.copybufsize = TARFILE_COPY_BUFSIZE
+                tar.extractall(outdir)
     except tarfile.TarError as exc:
         raise JobError("Unable to unpack %s: %s" % (infile, str(exc)))
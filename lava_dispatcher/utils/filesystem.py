@@ -31,7 +31,7 @@ import errno
 from configobj import ConfigObj
 
 from lava_common.exceptions import InfrastructureError, JobError, LAVABug
-from lava_common.constants import LXC_PATH, LAVA_LXC_HOME
+from lava_common.constants import LXC_PATH, LAVA_LXC_HOME, TARFILE_COPY_BUFSIZE
 from lava_dispatcher.utils.compression import decompress_file
 from lava_dispatcher.utils.decorator import replace_exception
 
@@ -149,8 +149,9 @@ def prepare_guestfs(output, overlay, size):
     tar_output = mkdtemp()
     # Now mount the filesystem so that we can add files.
     guest.mount(guest_device, "/")
-    tarball = tarfile.open(overlay)
-    tarball.extractall(tar_output)
+    # the overlay is only read once, from start to end
+    with tarfile.open(overlay, "r|*", bufsize=TARFILE_COPY_BUFSIZE) as tarball:
+        tarball.extractall(tar_output)
     guest_dir = mkdtemp()
     guest_tar = os.path.join(guest_dir, "guest.tar")
     root_tar = tarfile.open(guest_tar, "w")
@@ -149,7 +149,7 @@ class LinuxKernelMessages(Action):
                 res = "fail"
                 if action:
                     action.logger.warning(
-                        "%s: %s" % (action.name, cls.MESSAGE_CHOICES[index][2])
+                        "%s: %s", action.name, cls.MESSAGE_CHOICES[index][2]
                     )
                 # TRACE may need a newline to force a prompt
                 connection.sendline(connection.check_char)
@@ -165,7 +165,7 @@ class LinuxKernelMessages(Action):
                 res = "fail"
                 if action:
                     action.logger.error(
-                        "%s %s" % (action.name, cls.MESSAGE_CHOICES[index][2])
+                        "%s %s", action.name, cls.MESSAGE_CHOICES[index][2]
                     )
                 results.append(
                     {
@@ -184,7 +184,7 @@ class LinuxKernelMessages(Action):
                 res = "fail"
                 # user has declared this message to be terminal for this test job.
                 halt = "Matched job-specific failure message: '%s'" % fail_msg
-                action.logger.error("%s %s" % (action.name, halt))
+                action.logger.error("%s %s", action.name, halt)
                 results.append({"message": "kernel-messages"})
             elif index and index == cls.FREE_UNUSED or index == cls.FREE_INIT:
                 if init and index <= cls.FREE_INIT:
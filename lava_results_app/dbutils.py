@@ -27,7 +27,7 @@ from urllib.parse import quote
 
 from collections import OrderedDict  # pylint: disable=unused-import
 
-from lava_common.compat import yaml_load, yaml_safe_load
+from lava_common.compat import Dumper, yaml_dump, yaml_load, yaml_safe_load
 from lava_common.version import __version__
 from lava_results_app.models import (
     TestSuite,
@@ -45,6 +45,7 @@ def yaml_decimal_str(dumper, value):
 
 
 yaml.add_representer(decimal.Decimal, yaml_decimal_str)
+yaml.add_representer(decimal.Decimal, yaml_decimal_str, Dumper=Dumper)
 
 
 def _check_for_testset(result_dict, suite):
@@ -99,7 +100,7 @@ def create_metadata_store(results, job):
         data = results["extra"]
     try:
         with open(meta_filename, "w") as extra_store:
-            yaml.dump(data, extra_store)
+            yaml_dump(data, extra_store)
     except OSError as exc:  # LAVA-847
         msg = "[%d] Unable to create metadata store: %s" % (job.id, exc)
         logger.error(msg)
@@ -132,7 +133,7 @@ def map_scanned_results(results, job, markers, meta_filename):
     if "extra" in results:
         results["extra"] = meta_filename
 
-    metadata = yaml.dump(results)
+    metadata = yaml_dump(results)
     if len(metadata) > 4096:  # bug 2471 - test_length unit test
         msg = "[%d] Result metadata is too long. %s" % (job.id, metadata)
         logger.error(msg)
@@ -410,11 +411,27 @@ def map_metadata(description, job):
     """
     logger = logging.getLogger("lava-master")
     try:
-        submission_data = yaml_safe_load(job.definition)
         description_data = yaml_load(description)
     except yaml.YAMLError as exc:
         logger.exception("[%s] %s", job.id, exc)
         return False
+    return map_metadata_dict(description_data, job)
+
+
+def map_metadata_dict(description_data, job):
+    """
+    Same as map_metadata for a pipeline description that is already
+    loaded, avoiding a YAML round-trip.
+    :param description_data: the pipeline description as a dictionary
+    :param job: the TestJob to associate
+    :return: True on success, False on error
+    """
+    logger = logging.getLogger("lava-master")
+    try:
+        submission_data = yaml_safe_load(job.definition)
+    except yaml.YAMLError as exc:
+        logger.exception("[%s] %s", job.id, exc)
+        return False
     testdata, created = TestData.objects.get_or_create(testjob=job)
     if not created:
         # prevent updates of existing TestData
@@ -422,7 +439,7 @@ def map_metadata(description, job):
         return False
 
     # get job-action metadata
-    if description is None:
+    if description_data is None:
         logger.warning("[%s] skipping empty description", job.id)
         return False
     if not description_data:
@@ -1,17 +1,22 @@
+import contextlib
+import copy
+import functools
 import os
 import re
 import shutil
 import decimal
 
+from django.db.models import Count
 from django.urls.exceptions import NoReverseMatch
 from django.urls import reverse
 
-from lava_common.compat import yaml_dump, yaml_load, yaml_safe_load
+from lava_common.compat import yaml_dump, yaml_load, yaml_safe_dump, yaml_safe_load
 from lava_results_app.tests.test_names import TestCaseWithFactory
 from lava_scheduler_app.models import TestJob, Device
 from lava_scheduler_app.utils import mkdir
 from lava_results_app.dbutils import (
     map_metadata,
+    map_metadata_dict,
     map_scanned_results,
     create_metadata_store,
     _get_action_metadata,
@@ -22,31 +27,49 @@ from lava_dispatcher.parser import JobParser
 from lava_dispatcher.device import PipelineDevice
 from lava_dispatcher.tests.test_defs import allow_missing_path
 
+CASE_NAME_RE = re.compile(r"[-_a-zA-Z0-9.\(\)]+")
+
+
+@functools.lru_cache(maxsize=16)
+def _device_config(hostname, job_ctx):
+    # The device templates are static test files: render each context once.
+    device = Device.objects.get(hostname=hostname)
+    return device.load_configuration(yaml_safe_load(job_ctx))  # raw dict
+
 
 class TestMetaTypes(TestCaseWithFactory):
     """
     MetaType and ActionData generation
     """
 
-    def test_job(self):
-        MetaType.objects.all().delete()
-        TestJob.objects.all().delete()
-        job = TestJob.from_yaml_and_user(self.factory.make_job_yaml(), self.user)
-        job_def = yaml_safe_load(job.definition)
-        job_ctx = job_def.get("context", {})
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parser = JobParser()
+
+    def _describe(self, job, job_def=None):
+        # job_def: the submitted data, when the caller has it already
+        if job_def is None:
+            job_def = yaml_safe_load(job.definition)
+        job_ctx = dict(job_def.get("context", {}))
         job_ctx.update(
             {"no_kvm": True}
         )  # override to allow unit tests on all types of systems
-        device = Device.objects.get(hostname="fakeqemu1")
-        device_config = device.load_configuration(job_ctx)  # raw dict
-        parser = JobParser()
-        obj = PipelineDevice(device_config)
-        pipeline_job = parser.parse(job.definition, obj, job.id, None, "")
+        device_config = _device_config("fakeqemu1", yaml_safe_dump(job_ctx))
+        obj = PipelineDevice(copy.deepcopy(device_config))
+        pipeline_job = self.parser.parse(job.definition, obj, job.id, None, "")
         allow_missing_path(
             pipeline_job.pipeline.validate_actions, self, "qemu-system-x86_64"
         )
-        pipeline = pipeline_job.describe()
-        map_metadata(yaml_dump(pipeline), job)
+        return pipeline_job.describe()
+
+    def test_job(self):
+        MetaType.objects.all().delete()
+        TestJob.objects.all().delete()
+        data = self.factory.make_job_data()
+        job = TestJob.from_yaml_and_user(yaml_safe_dump(data), self.user)
+        pipeline = self._describe(job, data)
+        map_metadata_dict(pipeline, job)
         self.assertEqual(
             MetaType.objects.filter(metatype=MetaType.DEPLOY_TYPE).count(), 1
         )
@@ -57,26 +80,23 @@ class TestMetaTypes(TestCaseWithFactory):
         self.assertEqual(TestData.objects.all().count(), 1)
         testdata = TestData.objects.all()[0]
         self.assertEqual(testdata.testjob, job)
-        for actionlevel in ActionData.objects.all():
+        for actionlevel in ActionData.objects.select_related("testdata"):
             self.assertEqual(actionlevel.testdata, testdata)
         action_levels = []
         action_levels.extend(job.testdata.actionlevels.all())
         self.assertEqual(count, len(action_levels))
-        count = ActionData.objects.filter(
-            meta_type__metatype=MetaType.DEPLOY_TYPE
-        ).count()
-        self.assertNotEqual(
-            ActionData.objects.filter(meta_type__metatype=MetaType.BOOT_TYPE).count(), 0
-        )
-        self.assertEqual(
-            ActionData.objects.filter(
-                meta_type__metatype=MetaType.UNKNOWN_TYPE
-            ).count(),
-            0,
+        # one GROUP BY query instead of a count() per metatype
+        counts = dict(
+            ActionData.objects.values_list("meta_type__metatype")
+            .order_by()
+            .annotate(Count("id"))
         )
-        for actionlevel in ActionData.objects.filter(
-            meta_type__metatype=MetaType.BOOT_TYPE
-        ):
+        count = counts.get(MetaType.DEPLOY_TYPE, 0)
+        self.assertNotEqual(counts.get(MetaType.BOOT_TYPE, 0), 0)
+        self.assertEqual(counts.get(MetaType.UNKNOWN_TYPE, 0), 0)
+        for actionlevel in ActionData.objects.select_related(
+            "testdata__testjob"
+        ).filter(meta_type__metatype=MetaType.BOOT_TYPE):
             self.assertEqual(actionlevel.testdata.testjob.id, job.id)
         self.assertEqual(
             ActionData.objects.filter(
@@ -87,17 +107,12 @@ class TestMetaTypes(TestCaseWithFactory):
 
     def test_export(self):
         job = TestJob.from_yaml_and_user(self.factory.make_job_yaml(), self.user)
-        test_suite = TestSuite.objects.get_or_create(name="lava", job=job)[0]
+        test_suite = TestSuite.objects.create(name="lava", job=job)
         test_case = TestCase(
             id=1, name="name", suite=test_suite, result=TestCase.RESULT_FAIL
         )
         self.assertTrue(
-            any(
-                map(
-                    lambda v: v in testcase_export_fields(),
-                    export_testcase(test_case).keys(),
-                )
-            )
+            set(testcase_export_fields()) & export_testcase(test_case).keys()
         )
 
     def test_duration(self):
@@ -138,14 +153,12 @@ class TestMetaTypes(TestCaseWithFactory):
             # list of numbers, generates a much longer YAML string than just the count
             "result": "pass",
         }
-        pattern = "[-_a-zA-Z0-9.\\(\\)]+"
-        matches = re.search(pattern, test_dict["case"])
+        matches = CASE_NAME_RE.search(test_dict["case"])
         self.assertIsNotNone(matches)  # passes
         self.assertEqual(matches.group(0), test_dict["case"])
-        suite, _ = TestSuite.objects.get_or_create(
-            name=test_dict["definition"], job=job
-        )
-        case, _ = TestCase.objects.get_or_create(
+        # the job is new: nothing to look up before creating the rows
+        suite = TestSuite.objects.create(name=test_dict["definition"], job=job)
+        case = TestCase.objects.create(
             suite=suite, name=test_dict["case"], result=TestCase.RESULT_PASS
         )
         self.assertIsNotNone(reverse("lava.results.testcase", args=[case.id]))
@@ -155,7 +168,7 @@ class TestMetaTypes(TestCaseWithFactory):
         self.assertIsNotNone(map_scanned_results(test_dict, job, {}, None))
         # now break the reverse pattern
         test_dict["case"] = "unit test"  # whitespace in the case name
-        matches = re.search(pattern, test_dict["case"])
+        matches = CASE_NAME_RE.search(test_dict["case"])
         self.assertIsNotNone(matches)
         self.assertRaises(
             NoReverseMatch,
@@ -188,40 +201,46 @@ class TestMetaTypes(TestCaseWithFactory):
         )
 
         mkdir(os.path.dirname(filename))
-        if os.path.exists(meta_filename):
-            # isolate from other unit tests
+        # isolate from other unit tests
+        with contextlib.suppress(FileNotFoundError):
             os.unlink(meta_filename)
         self.assertEqual(meta_filename, create_metadata_store(results, job))
         ret = map_scanned_results(results, job, {}, meta_filename)
         self.assertIsNotNone(ret)
         ret.save()
-        self.assertEqual(TestCase.objects.filter(name="unit-test").count(), 1)
-        test_data = yaml_load(TestCase.objects.filter(name="unit-test")[0].metadata)
+        cases = list(TestCase.objects.filter(name="unit-test").only("metadata"))
+        self.assertEqual(len(cases), 1)
+        test_data = yaml_load(cases[0].metadata)
         self.assertEqual(test_data["extra"], meta_filename)
         self.assertTrue(os.path.exists(meta_filename))
         with open(test_data["extra"], "r") as extra_file:
             data = yaml_load(extra_file)
         self.assertIsNotNone(data)
-        os.unlink(meta_filename)
         shutil.rmtree(job.output_dir)
 
-    def test_repositories(self):
+    def test_metastore_bulk(self):
+        # store a large set of results in one query, as lava-logs does
         job = TestJob.from_yaml_and_user(self.factory.make_job_yaml(), self.user)
-        job_def = yaml_safe_load(job.definition)
-        job_ctx = job_def.get("context", {})
-        job_ctx.update(
-            {"no_kvm": True}
-        )  # override to allow unit tests on all types of systems
-        device = Device.objects.get(hostname="fakeqemu1")
-        device_config = device.load_configuration(job_ctx)  # raw dict
-        parser = JobParser()
-        obj = PipelineDevice(device_config)
-        pipeline_job = parser.parse(job.definition, obj, job.id, None, "")
-        allow_missing_path(
-            pipeline_job.pipeline.validate_actions, self, "qemu-system-x86_64"
-        )
-        pipeline = pipeline_job.describe()
-        testdata, _ = TestData.objects.get_or_create(testjob=job)
+        cases = []
+        for index in range(1000):
+            results = {
+                "definition": "lava",
+                "case": "unit-test-%d" % index,
+                "level": "1.3.5.%d" % index,
+                "result": "pass",
+            }
+            case = map_scanned_results(results, job, {}, None)
+            self.assertIsNotNone(case)
+            cases.append(case)
+        TestCase.objects.bulk_create(cases, batch_size=1000)
+        self.assertEqual(TestCase.objects.filter(suite__job=job).count(), 1000)
+        self.assertEqual(TestSuite.objects.filter(job=job, name="lava").count(), 1)
+
+    def test_repositories(self):
+        data = self.factory.make_job_data()
+        job = TestJob.from_yaml_and_user(yaml_safe_dump(data), self.user)
+        pipeline = self._describe(job, data)
+        TestData.objects.create(testjob=job)
         retval = _get_action_metadata(pipeline["job"]["actions"])
         self.assertEqual(
             retval,
@@ -247,21 +266,8 @@ class TestMetaTypes(TestCaseWithFactory):
             "VARIABLE_NAME_2": "second value",
         }
         job = TestJob.from_yaml_and_user(yaml_dump(data), self.user)
-        job_def = yaml_safe_load(job.definition)
-        job_ctx = job_def.get("context", {})
-        job_ctx.update(
-            {"no_kvm": True}
-        )  # override to allow unit tests on all types of systems
-        device = Device.objects.get(hostname="fakeqemu1")
-        device_config = device.load_configuration(job_ctx)  # raw dict
-        parser = JobParser()
-        obj = PipelineDevice(device_config)
-        pipeline_job = parser.parse(job.definition, obj, job.id, None, "")
-        allow_missing_path(
-            pipeline_job.pipeline.validate_actions, self, "qemu-system-x86_64"
-        )
-        pipeline = pipeline_job.describe()
-        testdata, _ = TestData.objects.get_or_create(testjob=job)
+        pipeline = self._describe(job, data)
+        TestData.objects.create(testjob=job)
         retval = _get_action_metadata(pipeline["job"]["actions"])
         self.assertIn("test.0.common.definition.parameters.VARIABLE_NAME_2", retval)
         self.assertIn("test.0.common.definition.parameters.VARIABLE_NAME_1", retval)
@@ -281,20 +287,8 @@ class TestMetaTypes(TestCaseWithFactory):
         with open(multi_test_file, "r") as test_support:
             data = test_support.read()
         job = TestJob.from_yaml_and_user(data, self.user)
-        job_def = yaml_safe_load(job.definition)
-        job_ctx = job_def.get("context", {})
-        job_ctx.update(
-            {"no_kvm": True}
-        )  # override to allow unit tests on all types of systems
-        device = Device.objects.get(hostname="fakeqemu1")
-        device_config = device.load_configuration(job_ctx)  # raw dict
-        parser = JobParser()
-        obj = PipelineDevice(device_config)
-        pipeline_job = parser.parse(job.definition, obj, job.id, None, "")
-        allow_missing_path(
-            pipeline_job.pipeline.validate_actions, self, "qemu-system-x86_64"
-        )
-        pipeline = pipeline_job.describe()
+        pipeline = self._describe(job)
+        # the YAML entry point, as used for a description read from disk
         map_metadata(yaml_dump(pipeline), job)
 
     def test_inline(self):
@@ -320,18 +314,5 @@ class TestMetaTypes(TestCaseWithFactory):
         ]
         test_block["test"]["definitions"] = smoke
         job = TestJob.from_yaml_and_user(yaml_dump(data), self.user)
-        job_def = yaml_safe_load(job.definition)
-        job_ctx = job_def.get("context", {})
-        job_ctx.update(
-            {"no_kvm": True}
-        )  # override to allow unit tests on all types of systems
-        device = Device.objects.get(hostname="fakeqemu1")
-        device_config = device.load_configuration(job_ctx)  # raw dict
-        parser = JobParser()
-        obj = PipelineDevice(device_config)
-        pipeline_job = parser.parse(job.definition, obj, job.id, None, "")
-        allow_missing_path(
-            pipeline_job.pipeline.validate_actions, self, "qemu-system-x86_64"
-        )
-        pipeline = pipeline_job.describe()
-        map_metadata(yaml_dump(pipeline), job)
+        pipeline = self._describe(job, data)
+        map_metadata_dict(pipeline, job)
@@ -253,7 +253,7 @@ class SchedulerWorkersAPI(ExposedV2API):
         This function returns an XML-RPC array of workers
         """
         workers = Worker.objects.all().order_by("hostname")
-        return [w.hostname for w in workers]
+        return list(workers.values_list("hostname", flat=True))
 
     def show(self, hostname):
         """
@@ -48,7 +48,7 @@ from lava_scheduler_app.models import (
     Worker,
 )
 from lava_scheduler_app.schema import validate_submission, SubmissionException
-from lava_results_app.dbutils import map_metadata
+from lava_results_app.dbutils import map_metadata_dict
 from lava_results_app.models import Query
 
 
@@ -131,7 +131,7 @@ def parse_job_description(job):
         logger.error("'Unable to open and parse '%s'", filename)
         return
 
-    if not map_metadata(description, job):
+    if not map_metadata_dict(pipeline, job):
         logger.warning("[%d] unable to map metadata", job.id)
 
     # add the compatibility result from the master to the definition for comparison on the slave.
@@ -24,12 +24,13 @@
 
 import contextlib
 import django
+import json
 import os
 import re
-import simplejson
 
 from lava_server.settings.production import *
 from lava_server.settings.config_file import ConfigFile
+from lava_server.settings.ldap_config import build_ldap_object
 
 from lava_server.settings.secret_key import get_secret_key
 
@@ -37,7 +38,7 @@ from lava_server.settings.secret_key import get_secret_key
 # Load the setting file and add the variables to the current context
 with contextlib.suppress(AttributeError, ValueError):
     with open("/etc/lava-server/settings.conf", "r") as f_conf:
-        for (k, v) in simplejson.load(f_conf).items():
+        for (k, v) in json.load(f_conf).items():
             globals()[k] = v
 
 # Fix mount point
@@ -76,19 +77,22 @@ if AUTH_LDAP_SERVER_URI:
     INSTALLED_APPS.append("ldap")
     INSTALLED_APPS.append("django_auth_ldap")
     import ldap
-    from django_auth_ldap.config import LDAPSearch, LDAPSearchUnion
-
-    def get_ldap_group_types():
-        """Return a list of all LDAP group types supported by django_auth_ldap module"""
-        import django_auth_ldap.config
-        import inspect
-
-        types = []
-        for name, obj in inspect.getmembers(django_auth_ldap.config):
-            if inspect.isclass(obj) and name.endswith("Type"):
-                types.append(name)
-
-        return types
+    import django_auth_ldap.config
+    import inspect
+
+    # Classes and modules that the LDAP settings are allowed to reference
+    ldap_names = {
+        name: obj
+        for name, obj in inspect.getmembers(django_auth_ldap.config, inspect.isclass)
+        if name.endswith("Type")
+    }
+    ldap_names.update(
+        {
+            "ldap": ldap,
+            "LDAPSearch": django_auth_ldap.config.LDAPSearch,
+            "LDAPSearchUnion": django_auth_ldap.config.LDAPSearchUnion,
+        }
+    )
 
     AUTHENTICATION_BACKENDS.append("django_auth_ldap.backend.LDAPBackend")
 
@@ -96,22 +100,16 @@ if AUTH_LDAP_SERVER_URI:
     # AUTH_LDAP_USER_DN_TEMPLATE AUTH_LDAP_USER_ATTR_MAP
 
     if AUTH_LDAP_USER_SEARCH:
-        AUTH_LDAP_USER_SEARCH = eval(AUTH_LDAP_USER_SEARCH.encode("utf-8"))
+        AUTH_LDAP_USER_SEARCH = build_ldap_object(AUTH_LDAP_USER_SEARCH, ldap_names)
         # AUTH_LDAP_USER_SEARCH and AUTH_LDAP_USER_DN_TEMPLATE are mutually
         # exclusive, hence,
         AUTH_LDAP_USER_DN_TEMPLATE = None
 
     if AUTH_LDAP_GROUP_SEARCH:
-        AUTH_LDAP_GROUP_SEARCH = eval(AUTH_LDAP_GROUP_SEARCH.encode("utf-8"))
+        AUTH_LDAP_GROUP_SEARCH = build_ldap_object(AUTH_LDAP_GROUP_SEARCH, ldap_names)
 
     if AUTH_LDAP_GROUP_TYPE:
-        group_type = AUTH_LDAP_GROUP_TYPE
-        # strip params from group type to get the class name
-        group_class = group_type.split("(", 1)[0]
-        group_types = get_ldap_group_types()
-        if group_class in group_types:
-            exec("from django_auth_ldap.config import " + group_class)
-            AUTH_LDAP_GROUP_TYPE = eval(group_type)
+        AUTH_LDAP_GROUP_TYPE = build_ldap_object(AUTH_LDAP_GROUP_TYPE, ldap_names)
 
 elif AUTH_DEBIAN_SSO:
     MIDDLEWARE.append("lava_server.debian_sso.DebianSsoUserMiddleware")
@@ -125,10 +123,14 @@ if USE_DEBUG_TOOLBAR:
 
 # List of compiled regular expression objects representing User-Agent strings
 # that are not allowed to visit any page, systemwide. Use this for bad
-# robots/crawlers
-DISALLOWED_USER_AGENTS = [
-    re.compile(r"%s" % reg, re.IGNORECASE) for reg in DISALLOWED_USER_AGENTS
-]
+# robots/crawlers. The patterns are combined so that CommonMiddleware only
+# runs one search per request.
+if DISALLOWED_USER_AGENTS:
+    DISALLOWED_USER_AGENTS = [
+        re.compile(
+            "|".join("(?:%s)" % reg for reg in DISALLOWED_USER_AGENTS), re.IGNORECASE
+        )
+    ]
 
 # Set instance name
 if os.path.exists("/etc/lava-server/instance.conf"):
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Build django_auth_ldap objects from settings.conf without eval().
+"""
+
+import ast
+import inspect
+
+
+def _build_node(node, names):
+    if isinstance(node, ast.Call):
+        func = node.func
+        if not isinstance(func, ast.Name) or not inspect.isclass(names.get(func.id)):
+            raise ValueError("Unsupported call in LDAP setting")
+        args = [_build_node(arg, names) for arg in node.args]
+        kwargs = {kw.arg: _build_node(kw.value, names) for kw in node.keywords}
+        return names[func.id](*args, **kwargs)
+    if isinstance(node, ast.Attribute):
+        # Only module constants like ldap.SCOPE_SUBTREE
+        module = node.value
+        if (
+            not isinstance(module, ast.Name)
+            or not inspect.ismodule(names.get(module.id))
+            or not node.attr.isupper()
+        ):
+            raise ValueError("Unsupported attribute in LDAP setting")
+        return getattr(names[module.id], node.attr)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_build_node(item, names) for item in node.elts]
+        return items if isinstance(node, ast.List) else tuple(items)
+    return ast.literal_eval(node)
+
+
+def build_ldap_object(value, names):
+    """
+    Build a django_auth_ldap configuration object.
+
+    :param value: either the documented Python-like string, for instance
+        "LDAPSearch('o=base', ldap.SCOPE_SUBTREE, '(uid=%(user)s)')", or a
+        dictionary like {"type": "LDAPSearch", "args": [...], "kwargs": {...}}
+        where nested dictionaries are built the same way.
+    :param names: the classes and modules that the value is allowed to use.
+    :raise: ValueError when the value uses anything else.
+    """
+    if isinstance(value, dict):
+        cls = names.get(value.get("type"))
+        if not inspect.isclass(cls):
+            raise ValueError("Unsupported type in LDAP setting: %s" % value.get("type"))
+        args = [
+            build_ldap_object(arg, names) if isinstance(arg, dict) else arg
+            for arg in value.get("args", [])
+        ]
+        return cls(*args, **value.get("kwargs", {}))
+    try:
+        tree = ast.parse(value.strip(), mode="eval")
+    except SyntaxError as exc:
+        raise ValueError("Invalid LDAP setting: %s" % exc)
+    return _build_node(tree.body, names)
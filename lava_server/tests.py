@@ -18,6 +18,7 @@
 # along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
 
 import pytest
+import types
 import xmlrpc.client
 
 from django.contrib.auth.models import Group, User
@@ -25,6 +26,7 @@ from django.contrib.auth.models import Group, User
 from lava_common.decorators import nottest
 from lava_scheduler_app.models import Device, DeviceType, Worker
 from lava_scheduler_app.tests.test_api import TestTransport
+from lava_server.settings.ldap_config import build_ldap_object
 
 
 class TestLavaServerApi:
@@ -221,3 +223,91 @@ class TestLavaServerApi:
         assert (  # nosec
             self.user2.has_perm("lava_scheduler_app.view_device", self.device1) == False
         )
+
+
+class LDAPSearch:
+    def __init__(self, base_dn, scope, filterstr="(objectClass=*)"):
+        self.base_dn = base_dn
+        self.scope = scope
+        self.filterstr = filterstr
+
+
+class LDAPSearchUnion:
+    def __init__(self, *searches):
+        self.searches = searches
+
+
+class GroupOfNamesType:
+    def __init__(self, name_attr="cn"):
+        self.name_attr = name_attr
+
+
+def ldap_names():
+    ldap = types.ModuleType("ldap")
+    ldap.SCOPE_SUBTREE = 2
+    return {
+        "ldap": ldap,
+        "LDAPSearch": LDAPSearch,
+        "LDAPSearchUnion": LDAPSearchUnion,
+        "GroupOfNamesType": GroupOfNamesType,
+    }
+
+
+def test_build_ldap_object_string():
+    search = build_ldap_object(
+        "LDAPSearch('o=base', ldap.SCOPE_SUBTREE, '(uid=%(user)s)')", ldap_names()
+    )
+    assert isinstance(search, LDAPSearch)
+    assert search.base_dn == "o=base"
+    assert search.scope == 2
+    assert search.filterstr == "(uid=%(user)s)"
+
+    union = build_ldap_object(
+        "LDAPSearchUnion(LDAPSearch('ou=a', ldap.SCOPE_SUBTREE), "
+        "LDAPSearch('ou=b', ldap.SCOPE_SUBTREE))",
+        ldap_names(),
+    )
+    assert [s.base_dn for s in union.searches] == ["ou=a", "ou=b"]
+
+    group_type = build_ldap_object("GroupOfNamesType(name_attr='uid')", ldap_names())
+    assert group_type.name_attr == "uid"
+
+
+def test_build_ldap_object_dict():
+    search = build_ldap_object(
+        {"type": "LDAPSearch", "args": ["o=base", 2, "(uid=%(user)s)"]}, ldap_names()
+    )
+    assert search.base_dn == "o=base"
+    assert search.scope == 2
+
+    union = build_ldap_object(
+        {
+            "type": "LDAPSearchUnion",
+            "args": [
+                {"type": "LDAPSearch", "args": ["ou=a", 2]},
+                {"type": "LDAPSearch", "args": ["ou=b", 2]},
+            ],
+        },
+        ldap_names(),
+    )
+    assert [s.base_dn for s in union.searches] == ["ou=a", "ou=b"]
+
+    group_type = build_ldap_object(
+        {"type": "GroupOfNamesType", "kwargs": {"name_attr": "uid"}}, ldap_names()
+    )
+    assert group_type.name_attr == "uid"
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "__import__('os').system('true')",
+        "LDAPSearch('o=base', ldap.__dict__)",
+        "open('/etc/passwd')",
+        "LDAPSearch(",
+        {"type": "open", "args": ["/etc/passwd"]},
+    ],
+)
+def test_build_ldap_object_invalid(value):
+    with pytest.raises(ValueError):
+        build_ldap_object(value, ldap_names())
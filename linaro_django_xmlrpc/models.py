@@ -341,6 +341,24 @@ class Mapper:
         methods.sort()
         return methods
 
+    def describe_method(self, name, context=None):
+        """
+        Lookup the signature and the documentation of the specified method.
+
+        This is equivalent to calling system.methodSignature() and
+        system.methodHelp() but the registered class is only instantiated
+        once.
+
+        @return A (signature, help) tuple. Both values are empty strings if
+        the name does not designate any registered entity.
+        """
+        impl = self.lookup(name, context)
+        if impl is None:
+            return "", ""
+        # When signature is not known return "undef"
+        # See: http://xmlrpc-c.sourceforge.net/introspection.html
+        return getattr(impl, "xml_rpc_signature", "undef"), pydoc.getdoc(impl)
+
     def register_introspection_methods(self):
         """
         Register SystemAPI as 'system' object.
@@ -218,6 +218,14 @@ class MapperTests(TestCase):
         retval = self.mapper.list_methods()
         self.assertEqual(retval, ["SourceA.a", "SourceB.a"])
 
+    def test_describe_method(self):
+        self.mapper.register(ExampleAPI, "ExampleAPI")
+        self.assertEqual(
+            self.mapper.describe_method("ExampleAPI.foo"), ("str", "foo docstring")
+        )
+        self.assertEqual(self.mapper.describe_method("ExampleAPI.bar"), ("undef", ""))
+        self.assertEqual(self.mapper.describe_method("ExampleAPI.missing"), ("", ""))
+
 
 @nottest
 class TestAPI(ExposedAPI):
@@ -104,43 +104,17 @@ def help(request, mapper, template_name="linaro_django_xmlrpc/api.html"):
         scheme = "https"
     else:
         scheme = request.META.get("REQUEST_SCHEME", "http")
-    scheduler_methods = []
-    results_methods = []
-    system_methods = []
+    methods = {"scheduler": [], "results": [], "system": []}
     for method in system.listMethods():
+        signature, method_help = mapper.describe_method(method, context)
+        info = {"name": method, "signature": signature, "help": method_help}
         if "scheduler" in method:
-            scheduler_methods.append(method)
+            info["section"] = method.rsplit(".", 1)[0] if "." in method else ""
+            methods["scheduler"].append(info)
         elif "results" in method:
-            results_methods.append(method)
+            methods["results"].append(info)
         else:
-            system_methods.append(method)
-    methods = {
-        "scheduler": [
-            {
-                "name": method,
-                "section": method.rsplit(".", 1)[0] if "." in method else "",
-                "signature": system.methodSignature(method),
-                "help": system.methodHelp(method),
-            }
-            for method in scheduler_methods
-        ],
-        "results": [
-            {
-                "name": method,
-                "signature": system.methodSignature(method),
-                "help": system.methodHelp(method),
-            }
-            for method in results_methods
-        ],
-        "system": [
-            {
-                "name": method,
-                "signature": system.methodSignature(method),
-                "help": system.methodHelp(method),
-            }
-            for method in system_methods
-        ],
-    }
+            methods["system"].append(info)
     domain = Site.objects.get_current().domain
     return render(
         request,
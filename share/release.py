@@ -21,21 +21,36 @@
 # along with this program; if not, see <http://www.gnu.org/licenses>.
 
 import argparse
+import concurrent.futures
 import contextlib
+import functools
 import itertools
 import os
 import requests
 import subprocess
 import shlex
 import sys
+import threading
 import time
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 
 #############
 # Constants #
 #############
 GITLAB_API = "https://git.lavasoftware.org/api/v4/projects/2"
 REGISTRY = "hub.lavasoftware.org/lava/lava"
+# Share one connection between the ssh and scp calls to lavasoftware.org
+SSH_OPTIONS = [
+    "-o",
+    "ControlMaster=auto",
+    "-o",
+    "ControlPath=~/.ssh/cm-%r@%h:%p",
+    "-o",
+    "ControlPersist=60s",
+]
 COLORS = {
     "blue": "\x1b[1;34;40m",
     "purple": "\x1b[1;35;40m",
@@ -44,40 +59,168 @@ COLORS = {
     "yellow": "\x1b[1;33;40m",
     "reset": "\x1b[0m",
 }
+# The static analyzers are independent from each other
+ANALYZERS = [
+    ".gitlab-ci/analyze/black.sh",
+    ".gitlab-ci/analyze/job-schema.sh",
+    ".gitlab-ci/analyze/pylint.sh",
+]
+TESTS = [
+    ".gitlab-ci/test/dispatcher-debian-10.sh",
+    ".gitlab-ci/test/server-debian-10.sh",
+]
+# Actions that are only a list of commands and can run concurrently
+STAGES = {
+    "build": [".gitlab-ci/build/amd64/pkg-debian-10.sh", ".gitlab-ci/build/doc.sh"],
+    "test": ANALYZERS + TESTS,
+}
+PRINT_LOCK = threading.Lock()
+# Keep the connection to the GitLab API open between polls
+SESSION = requests.Session()
+SESSION.headers["Accept"] = "application/json"
+# Retry the requests hitting a transient gateway error
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+    ),
+)
+# Commits whose pipeline already succeeded: a finished pipeline never changes
+SUCCESSFUL_COMMITS = set()
 
 
 ###########
 # Helpers #
 ###########
-def run(cmd, options, env=None):
-    print(
+@functools.lru_cache(maxsize=8)
+def _merged_env(items):
+    # The environment of this process does not change: build each variant once
+    return {**os.environ, **dict(items)}
+
+
+def log(line="", prefix=None):
+    # Print whole lines only so that concurrent tasks are not mixed up
+    with PRINT_LOCK:
+        if prefix is None:
+            print(line)
+        else:
+            print("%s[%s]%s %s" % (COLORS["purple"], prefix, COLORS["reset"], line))
+        sys.stdout.flush()
+
+
+def _step(cmd, count, options, env=None, prefix=None):
+    # cmd is either a list of arguments or a string to split.
+    # When prefix is set, the command output is read line by line and each
+    # line is printed with the prefix.
+    if isinstance(cmd, str):
+        cmd = shlex.split(cmd)
+    cmd_str = " ".join(shlex.quote(arg) for arg in cmd)
+    log(
         "%s[%02d] $ %s%s%s"
-        % (COLORS["blue"], options.count, COLORS["white"], cmd, COLORS["reset"])
+        % (COLORS["blue"], count, COLORS["white"], cmd_str, COLORS["reset"]),
+        prefix,
     )
-    if options.steps and options.skip < options.count:
+    # Only prompt from the main thread: concurrent steps never wait for the user
+    if options.steps and prefix is None and options.skip < count:
         try:
             input()
         except EOFError:
             options.steps = False
     ret = 0
-    if options.skip >= options.count:
-        print("-> skip")
+    if options.skip >= count:
+        log("-> skip", prefix)
     elif not options.dry_run:
         if env is not None:
-            env = {**os.environ, **env}
-        ret = subprocess.call(shlex.split(cmd), env=env)
+            env = _merged_env(tuple(sorted(env.items())))
+        if prefix is None:
+            ret = subprocess.call(cmd, env=env)
+        else:
+            proc = subprocess.Popen(
+                cmd,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=1,
+                universal_newlines=True,
+            )
+            with proc.stdout:
+                for line in proc.stdout:
+                    log(line.rstrip("\n"), prefix)
+            ret = proc.wait()
+    if prefix is None:
+        print("")
+    if ret != 0:
+        raise Exception("Unable to run '%s', returned %d" % (cmd_str, ret))
+
+
+def run(cmd, options, env=None):
+    count = options.count
     options.count += 1
+    _step(cmd, count, options, env)
+
+
+def run_parallel(tasks, options, env=None, max_workers=3):
+    # Each task is a (title, commands) tuple: the tasks run concurrently while
+    # the commands of one task run in order. The output lines are prefixed by
+    # the task title. Steps are numbered as if they had been run serially so
+    # that --skip is not affected.
+    numbered = []
+    for (title, cmds) in tasks:
+        numbered.append((title, list(enumerate(cmds, start=options.count))))
+        options.count += len(cmds)
+
+    if options.steps:
+        # Waiting for the user only makes sense one step at a time
+        for (title, cmds) in numbered:
+            print("%s# %s%s" % (COLORS["purple"], title, COLORS["reset"]))
+            for (count, cmd) in cmds:
+                _step(cmd, count, options, env)
+        return
+
+    def run_task(title, cmds):
+        for (count, cmd) in cmds:
+            _step(cmd, count, options, env, title)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_task, *task) for task in numbered]
+    for future in futures:
+        future.result()
     print("")
-    if ret != 0:
-        raise Exception("Unable to run '%s', returned %d" % (cmd, ret))
+
+
+def rev_parse(ref):
+    return (
+        subprocess.check_output(["git", "rev-parse", ref]).decode("utf-8").rstrip("\n")
+    )
 
 
 def wait_pipeline(options, commit):
-    # Wait for the pipeline to finish
-    while True:
-        ret = requests.get(GITLAB_API + "/repository/commits/" + commit)
-        status = ret.json().get("last_pipeline", {}).get("status", "")
+    # Wait for the pipeline to finish, polling less often as time goes by
+    delay = 2.0
+    while commit not in SUCCESSFUL_COMMITS:
+        try:
+            # Only fetch the latest pipeline for this commit
+            ret = SESSION.get(
+                GITLAB_API + "/pipelines",
+                params={"sha": commit, "per_page": 1},
+                timeout=10,
+            )
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.RetryError,
+        ):
+            # Network or gateway error, already retried: try again later
+            ret = None
+        if ret is None or ret.status_code >= 500:
+            status = ""
+        else:
+            # Client errors (wrong project, missing access) will not go away
+            ret.raise_for_status()
+            pipelines = ret.json()
+            status = pipelines[0]["status"] if pipelines else ""
         if status == "success":
+            SUCCESSFUL_COMMITS.add(commit)
             break
         elif status == "failed":
             raise Exception("The pipeline failed")
@@ -87,7 +230,8 @@ def wait_pipeline(options, commit):
             raise Exception("The pipeline was skipped")
         sys.stdout.write(".")
         sys.stdout.flush()
-        time.sleep(10)
+        time.sleep(delay)
+        delay = min(delay * 1.5, 30.0)
 
 
 ############
@@ -96,39 +240,53 @@ def wait_pipeline(options, commit):
 def handle_prepare(options):
     # Generate the debian changelog
     run(
-        'gbp dch --new-version="%s-1" --id-length=9 --release --commit --commit-msg="LAVA Software %s release"'
-        % (options.version, options.version),
+        [
+            "gbp",
+            "dch",
+            "--new-version=%s-1" % options.version,
+            "--id-length=9",
+            "--release",
+            "--commit",
+            "--commit-msg=LAVA Software %s release" % options.version,
+        ],
         options,
     )
     # Create the git tag
     run(
-        'git tag --annotate --message="LAVA Software %s release" --sign -u release@lavasoftware.org %s'
-        % (options.version, options.version),
+        [
+            "git",
+            "tag",
+            "--annotate",
+            "--message=LAVA Software %s release" % options.version,
+            "--sign",
+            "-u",
+            "release@lavasoftware.org",
+            options.version,
+        ],
         options,
     )
 
 
 def handle_build(options):
-    run(".gitlab-ci/build/amd64/pkg-debian-10.sh", options)
-    run(".gitlab-ci/build/doc.sh", options)
+    for cmd in STAGES["build"]:
+        run(cmd, options)
 
 
 def handle_test(options):
-    run(".gitlab-ci/analyze/black.sh", options)
-    run(".gitlab-ci/analyze/job-schema.sh", options)
-    run(".gitlab-ci/analyze/pylint.sh", options)
-    run(".gitlab-ci/test/dispatcher-debian-10.sh", options)
-    run(".gitlab-ci/test/server-debian-10.sh", options)
+    run_parallel(
+        [(os.path.basename(cmd), [cmd]) for cmd in ANALYZERS],
+        options,
+        max_workers=min(len(ANALYZERS), os.cpu_count() or 1),
+    )
+    # The unit tests may use the whole docker daemon: run them one by one
+    for cmd in TESTS:
+        run(cmd, options)
 
 
 def handle_push(options):
     # Push the commit and wait for the CI
-    run("git push origin master", options)
-    commit = (
-        subprocess.check_output(["git", "rev-parse", "origin/master"])
-        .decode("utf-8")
-        .rstrip("\n")
-    )
+    run(["git", "push", "origin", "master"], options)
+    commit = rev_parse("origin/master")
 
     print("%s# wait for CI%s" % (COLORS["purple"], COLORS["reset"]))
     if not options.dry_run and not options.skip >= options.count:
@@ -136,108 +294,222 @@ def handle_push(options):
     print("done\n")
 
     # The CI was a success so we can push the tag
-    run("git push --tags origin master", options)
+    run(["git", "push", "--tags", "origin", "master"], options)
 
 
 def handle_publish(options):
     # Check that the CI was a success
     print("%s# wait for CI%s" % (COLORS["purple"], COLORS["reset"]))
     if not options.dry_run and not options.skip >= options.count:
-        commit = (
-            subprocess.check_output(["git", "rev-parse", options.version])
-            .decode("utf-8")
-            .rstrip("\n")
-        )
+        # Look for the pipeline of the tagged commit, not of the tag object
+        commit = rev_parse(options.version + "^{commit}")
         wait_pipeline(options, commit)
     print("done\n")
 
-    for name in ["buster", "stretch-backports"]:
-        print("%s# sign %s .deb%s" % (COLORS["purple"], name, COLORS["reset"]))
-        run(
-            "scp lavasoftware.org:/home/gitlab-runner/repository/current-release/dists/%s/Release Release"
-            % name,
-            options,
-        )
-        run(
-            "gpg -u C87D63FD935535CFB0CAF5C2A791358F2E49B100 -a --detach-sign Release",
-            options,
-        )
-        run("scp Release.asc lavasoftware.org:~/Release.gpg", options)
-        run(
-            "ssh -t lavasoftware.org sudo mv ~/Release.gpg /home/gitlab-runner/repository/current-release/dists/%s/Release.gpg"
-            % name,
-            options,
-        )
+    suites = ["buster", "stretch-backports"]
+    dists = "/home/gitlab-runner/repository/current-release/dists"
+
+    # Fetching and uploading do not need any input: run them for all suites at
+    # once. gpg and sudo may prompt for a password so they stay serial.
+    run_parallel(
+        [
+            (
+                "fetch %s" % name,
+                [
+                    ["scp"]
+                    + SSH_OPTIONS
+                    + [
+                        "lavasoftware.org:%s/%s/Release" % (dists, name),
+                        "Release.%s" % name,
+                    ]
+                ],
+            )
+            for name in suites
+        ],
+        options,
+        max_workers=len(suites),
+    )
+    print("%s# sign .deb%s" % (COLORS["purple"], COLORS["reset"]))
+    for name in suites:
         run(
-            "ssh -t lavasoftware.org sudo chown gitlab-runner:gitlab-runner /home/gitlab-runner/repository/current-release/dists/%s/Release.gpg"
-            % name,
+            [
+                "gpg",
+                "-u",
+                "C87D63FD935535CFB0CAF5C2A791358F2E49B100",
+                "-a",
+                "--detach-sign",
+                "Release.%s" % name,
+            ],
             options,
         )
-        if not options.dry_run and not options.skip >= options.count:
+    run_parallel(
+        [
+            (
+                "upload %s" % name,
+                [
+                    ["scp"]
+                    + SSH_OPTIONS
+                    + [
+                        "Release.%s.asc" % name,
+                        "lavasoftware.org:~/Release.%s.gpg" % name,
+                    ]
+                ],
+            )
+            for name in suites
+        ],
+        options,
+        max_workers=len(suites),
+    )
+    print("%s# install Release.gpg%s" % (COLORS["purple"], COLORS["reset"]))
+    run(
+        ["ssh", "-t"]
+        + SSH_OPTIONS
+        + [
+            "lavasoftware.org",
+            " && ".join(
+                "sudo mv ~/Release.%s.gpg %s/%s/Release.gpg && sudo chown gitlab-runner:gitlab-runner %s/%s/Release.gpg"
+                % (name, dists, name, dists, name)
+                for name in suites
+            ),
+        ],
+        options,
+    )
+    if not options.dry_run and not options.skip >= options.count:
+        for name in suites:
             with contextlib.suppress(FileNotFoundError):
-                os.unlink("Release")
+                os.unlink("Release.%s" % name)
             with contextlib.suppress(FileNotFoundError):
-                os.unlink("Release.asc")
+                os.unlink("Release.%s.asc" % name)
 
     print("%s# publish the new repository%s" % (COLORS["purple"], COLORS["reset"]))
     # TODO: move the old-release directory
     run(
-        "ssh -t lavasoftware.org 'cd /home/gitlab-runner/repository && sudo ln -snf current-release release'",
+        ["ssh", "-t"]
+        + SSH_OPTIONS
+        + [
+            "lavasoftware.org",
+            "cd /home/gitlab-runner/repository && sudo ln -snf current-release release",
+        ],
         options,
     )
 
-    # Pull/Push the docker images
-    for (name, arch) in itertools.product(
-        ["dispatcher", "server"], ["aarch64", "amd64"]
-    ):
-        print(
-            "%s# push docker images for (%s, %s)%s"
-            % (COLORS["purple"], name, arch, COLORS["reset"])
-        )
-        run(
-            "docker pull %s/%s/lava-%s:%s" % (REGISTRY, arch, name, options.version),
-            options,
-        )
-        run(
-            "docker tag %s/%s/lava-%s:%s lavasoftware/%s-lava-%s:%s"
-            % (REGISTRY, arch, name, options.version, arch, name, options.version),
-            options,
-        )
-        run(
-            "docker push lavasoftware/%s-lava-%s:%s" % (arch, name, options.version),
-            options,
-        )
-        run(
-            "docker tag %s/%s/lava-%s:%s lavasoftware/%s-lava-%s:latest"
-            % (REGISTRY, arch, name, options.version, arch, name),
+    # Publish the docker images
+    images = list(itertools.product(["dispatcher", "server"], ["aarch64", "amd64"]))
+    if options.no_imagetools:
+        # Download all the images at once before tagging and pushing them
+        run_parallel(
+            [
+                (
+                    "pull %s/%s" % (name, arch),
+                    [
+                        [
+                            "docker",
+                            "pull",
+                            "%s/%s/lava-%s:%s"
+                            % (REGISTRY, arch, name, options.version),
+                        ]
+                    ],
+                )
+                for (name, arch) in images
+            ],
             options,
+            max_workers=len(images),
         )
-        run("docker push lavasoftware/%s-lava-%s:latest" % (arch, name), options)
+        tasks = []
+        for (name, arch) in images:
+            source = "%s/%s/lava-%s:%s" % (REGISTRY, arch, name, options.version)
+            target = "lavasoftware/%s-lava-%s" % (arch, name)
+            tasks.append(
+                (
+                    "push %s/%s" % (name, arch),
+                    [
+                        ["docker", "tag", source, "%s:%s" % (target, options.version)],
+                        ["docker", "push", "%s:%s" % (target, options.version)],
+                        ["docker", "tag", source, "%s:latest" % target],
+                        ["docker", "push", "%s:latest" % target],
+                    ],
+                )
+            )
+    else:
+        # Copy the images registry to registry, without going through the
+        # local docker daemon
+        tasks = [
+            (
+                "copy %s/%s" % (name, arch),
+                [
+                    [
+                        "docker",
+                        "buildx",
+                        "imagetools",
+                        "create",
+                        "--tag",
+                        "lavasoftware/%s-lava-%s:%s" % (arch, name, options.version),
+                        "--tag",
+                        "lavasoftware/%s-lava-%s:latest" % (arch, name),
+                        "%s/%s/lava-%s:%s" % (REGISTRY, arch, name, options.version),
+                    ]
+                ],
+            )
+            for (name, arch) in images
+        ]
+    # The manifests below need all the images to be pushed
+    run_parallel(tasks, options)
 
-    print("%s# push docker manifests%s" % (COLORS["purple"], COLORS["reset"]))
-    for name in ["dispatcher", "server"]:
-        run(
-            "docker manifest create lavasoftware/lava-%s:%s lavasoftware/aarch64-lava-%s:%s lavasoftware/amd64-lava-%s:%s"
-            % (name, options.version, name, options.version, name, options.version),
-            options,
-            env={"DOCKER_CLI_EXPERIMENTAL": "enabled"},
-        )
-        run(
-            "docker manifest push --purge lavasoftware/lava-%s:%s"
-            % (name, options.version),
-            options,
-            env={"DOCKER_CLI_EXPERIMENTAL": "enabled"},
+    if options.no_imagetools:
+        # Each manifest is created then pushed, the manifests are independent
+        tasks = []
+        for (name, tag) in itertools.product(
+            ["dispatcher", "server"], [options.version, "latest"]
+        ):
+            tasks.append(
+                (
+                    "manifest %s:%s" % (name, tag),
+                    [
+                        [
+                            "docker",
+                            "manifest",
+                            "create",
+                            "lavasoftware/lava-%s:%s" % (name, tag),
+                            "lavasoftware/aarch64-lava-%s:%s" % (name, tag),
+                            "lavasoftware/amd64-lava-%s:%s" % (name, tag),
+                        ],
+                        [
+                            "docker",
+                            "manifest",
+                            "push",
+                            "--purge",
+                            "lavasoftware/lava-%s:%s" % (name, tag),
+                        ],
+                    ],
+                )
+            )
+        run_parallel(
+            tasks, options, env={"DOCKER_CLI_EXPERIMENTAL": "enabled"}, max_workers=4
         )
-        run(
-            "docker manifest create lavasoftware/lava-%s:latest lavasoftware/aarch64-lava-%s:latest lavasoftware/amd64-lava-%s:latest"
-            % (name, name, name),
-            options,
-            env={"DOCKER_CLI_EXPERIMENTAL": "enabled"},
-        )
-        run(
-            "docker manifest push --purge lavasoftware/lava-%s:latest" % (name),
+    else:
+        # Create and push each multi-architecture manifest in one call
+        run_parallel(
+            [
+                (
+                    "manifest %s" % name,
+                    [
+                        [
+                            "docker",
+                            "buildx",
+                            "imagetools",
+                            "create",
+                            "--tag",
+                            "lavasoftware/lava-%s:%s" % (name, options.version),
+                            "--tag",
+                            "lavasoftware/lava-%s:latest" % name,
+                            "lavasoftware/aarch64-lava-%s:%s" % (name, options.version),
+                            "lavasoftware/amd64-lava-%s:%s" % (name, options.version),
+                        ]
+                    ],
+                )
+                for name in ["dispatcher", "server"]
+            ],
             options,
-            env={"DOCKER_CLI_EXPERIMENTAL": "enabled"},
         )
 
 
@@ -260,6 +532,18 @@ def main():
         "--steps", action="store_true", default=False, help="Run step by step"
     )
     parser.add_argument("--skip", type=int, default=0, help="Skip some steps")
+    parser.add_argument(
+        "--parallel-stages",
+        default="",
+        help="comma separated list of actions to run concurrently (%s)"
+        % ", ".join(sorted(STAGES)),
+    )
+    parser.add_argument(
+        "--no-imagetools",
+        action="store_true",
+        default=False,
+        help="use docker pull/tag/push/manifest instead of docker buildx",
+    )
     parser.add_argument("version", type=str, help="new version")
 
     # Parse the command line
@@ -273,23 +557,44 @@ def main():
         "publish": handle_publish,
     }
 
+    actions = options.actions.split(",")
+    parallel = [a for a in options.parallel_stages.split(",") if a]
+    for action in parallel:
+        if action not in STAGES:
+            raise NotImplementedError("Action '%s' cannot run concurrently" % action)
+    grouped = [a for a in actions if a in parallel]
+    if len(grouped) > 1:
+        # Run the grouped actions as a single one, in place of the first one
+        name = "+".join(grouped)
+        handlers[name] = lambda options: run_parallel(
+            [(a, STAGES[a]) for a in grouped], options, max_workers=len(grouped)
+        )
+        index = actions.index(grouped[0])
+        actions = [a for a in actions if a not in grouped]
+        actions.insert(index, name)
+
     first = True
     options.count = 1
-    for action in options.actions.split(","):
-        if action in handlers:
-            if not first:
-                print("")
-            print("%s%s%s" % (COLORS["yellow"], action.capitalize(), COLORS["reset"]))
-            print("%s%s%s" % (COLORS["yellow"], "-" * len(action), COLORS["reset"]))
-            try:
-                handlers[action](options)
-            except Exception as exc:
-                print("%sexception: %s%s" % (COLORS["red"], str(exc), COLORS["reset"]))
-                raise
-                return 1
-        else:
-            raise NotImplementedError("Action '%s' does not exists" % action)
-        first = False
+    with SESSION:
+        for action in actions:
+            if action in handlers:
+                if not first:
+                    print("")
+                print(
+                    "%s%s%s" % (COLORS["yellow"], action.capitalize(), COLORS["reset"])
+                )
+                print("%s%s%s" % (COLORS["yellow"], "-" * len(action), COLORS["reset"]))
+                try:
+                    handlers[action](options)
+                except Exception as exc:
+                    print(
+                        "%sexception: %s%s" % (COLORS["red"], str(exc), COLORS["reset"])
+                    )
+                    raise
+                    return 1
+            else:
+                raise NotImplementedError("Action '%s' does not exists" % action)
+            first = False
 
 
 if __name__ == "__main__":